@@ -3,18 +3,255 @@ GitHub Helper Module for Creating Pull Requests
 """
 
 import os
+import base64
 import random
 import tempfile
 import shutil
 import hashlib
+import heapq
 import re
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from github import Github, GithubException
+from github import Github, GithubException, InputGitTreeElement
 from git import Repo, GitCommandError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns used on every PR request
+# Deletion patterns, each run over every line: their matches overlap (a
+# "dir/file.py.bak" path matches both the first and the last), so they can't
+# be merged into one alternation without losing results
+_DELETION_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        # Match "delete/remove [the] [file] <filename>"
+        r'(?:delete|remove)\s+(?:the\s+)?(?:file\s+)?([a-zA-Z0-9_/.-]+\.(?:py|js|ts|tsx|jsx|java|go|rs|md|txt|json|yaml|yml|xml|html|css|sh|bat|rb|php|cpp|c|h|hpp))',
+        # Match "<filename>" in quotes after delete/remove
+        r'(?:delete|remove)\s+["\']([a-zA-Z0-9_/.-]+\.[a-zA-Z0-9]+)["\']',
+        # Match file paths with directory
+        r'(?:delete|remove)\s+(?:the\s+)?(?:file\s+)?([a-zA-Z0-9_/-]+/[a-zA-Z0-9_/.-]+\.[a-zA-Z0-9]+)',
+    )
+]
+_MENTION_RE = re.compile(r'<@[A-Z0-9]+>')
+_STOPWORDS_RE = re.compile(r'\b(create|make|open|submit|generate|a|an|the|pr|pull request|for|to)\b', re.IGNORECASE)
+# Anything outside the branch-safe ASCII set is dropped from slugs (including
+# non-ASCII punctuation), so an all-symbol prompt falls back to "task"
+_SLUG_STRIP_RE = re.compile(r'[^a-z0-9_\s-]')
+_SLUG_DASH_RE = re.compile(r'[-\s]+')
+_BRANCH_INVALID_RE = re.compile(r'[^a-z0-9\-_]')
+_FILENAME_RE = re.compile(r'[\w_/\-]+\.[\w]+')
+_WORD_RE = re.compile(r'\b[\w_]+\b')
+_ESCAPE_RE = re.compile(r'\\n')
+_TOTAL_TASKS_RE = re.compile(rb'Total Tasks: (\d+)')  # matched against BOT_STATS.md bytes
+
+# File extensions to include in codebase context, mapped to their base score
+_PRIORITY_EXTENSIONS = {'.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.rs', '.java'}
+_SECONDARY_EXTENSIONS = {'.cpp', '.c', '.h', '.hpp', '.cs', '.rb', '.php', '.swift', '.kt', '.scala'}
+_CONFIG_EXTENSIONS = {'.json', '.yaml', '.yml', '.toml', '.md', '.txt', '.sh', '.bash'}
+_EXTENSION_SCORES = {
+    **{ext: 3 for ext in _CONFIG_EXTENSIONS},
+    **{ext: 5 for ext in _SECONDARY_EXTENSIONS},
+    **{ext: 10 for ext in _PRIORITY_EXTENSIONS},
+}
+
+# Binary formats that are never useful as code context (skipped before fetching)
+_BINARY_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.pdf',
+    '.zip', '.gz', '.tar', '.jar', '.woff', '.woff2', '.ttf', '.eot',
+    '.mp3', '.mp4', '.mov', '.exe', '.dll', '.so', '.pyc',
+})
+
+# Directories to skip when scanning the repository tree
+_SKIP_DIRS = (
+    'node_modules', '__pycache__', '.git', 'venv', '.venv',
+    'dist', 'build', 'target', '.idea', '.vscode', 'vendor',
+    'bin', 'obj', '.next', '.nuxt', 'coverage', 'test', 'tests',
+    '__tests__', 'spec', 'docs', '.github'
+)
+_SKIP_RE = re.compile(r'(?:^|/)(?:' + '|'.join(re.escape(d) for d in _SKIP_DIRS) + r')(?:/|$)')
+
+# Path fragments that boost a file's score for each task type
+_TASK_PATH_BOOSTS = {
+    "testing": re.compile(r'test|spec'),
+    "frontend": re.compile(r'component|page|view|ui|client|frontend'),
+    "api": re.compile(r'api|route|handler|controller|endpoint'),
+    "database": re.compile(r'model|schema|migration|database|db'),
+    "auth": re.compile(r'auth|login|user|session|token'),
+}
+
+# Prompt keywords per task type, in priority order (first match wins)
+_TASK_TYPE_KEYWORDS = {
+    "testing": ['test', 'unit test', 'testing', 'pytest', 'jest'],
+    "frontend": ['ui', 'frontend', 'page', 'component', 'html', 'css', 'react', 'vue'],
+    "api": ['api', 'endpoint', 'route', 'handler', 'controller'],
+    "database": ['database', 'db', 'model', 'schema', 'migration', 'sql'],
+    "auth": ['auth', 'login', 'authentication', 'authorization', 'user'],
+}
+# One compiled alternation per task type, searched in the order above. A single
+# combined scan would let an earlier match hide an overlapping one ("reactest")
+_TASK_TYPE_RES = {
+    task_type: re.compile('|'.join(map(re.escape, kws)))
+    for task_type, kws in _TASK_TYPE_KEYWORDS.items()
+}
+
+# Key files that are always worth including
+_KEY_FILES = frozenset({'README.md', 'package.json', 'requirements.txt', 'setup.py'})
+
+# Retry policy for GitHub API calls (rate limits and transient server errors)
+_RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+_MAX_RETRIES = 5
+_RETRY_BASE_DELAY = 1.0  # seconds, doubled on each attempt
+_MAX_RETRY_WAIT = 60  # seconds; give up rather than block a Slack handler longer
+
+# Concurrent GitHub requests per operation (stays under secondary rate limits)
+_MAX_API_WORKERS = 5
+
+# Keep-alive connections shared by all GitHub calls from one helper (>= worker count).
+# Transport retries stay with PyGithub's default GithubRetry, which also handles
+# rate limits for calls not wrapped in _gh_retry
+_GITHUB_POOL_SIZE = 16
+
+# How long fetched pull request info is reused across merge/info/revert calls
+_PR_CACHE_TTL = 30  # seconds
+
+# Everything merge_pr / get_pr_info / create_revert_pr read, in one request
+_PR_INFO_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      number title state merged mergeable url headRefName baseRefName
+      body createdAt mergedAt author { login } mergeCommit { oid }
+    }
+  }
+}
+"""
+_MERGEABLE_STATES = {"MERGEABLE": True, "CONFLICTING": False}
+
+# Shallow clone used by the git-revert fallback
+_CLONE_DEPTH = 50
+_CLONE_DEEPEN = 200
+_CLONE_DEEPEN_ATTEMPTS = 3  # then fetch the full history
+
+
+def _retry_delay(error, attempt, rate_limit_only=False):
+    """
+    Work out how long to wait before retrying a failed GitHub call
+    
+    Args:
+        error: GithubException raised by PyGithub
+        attempt: Zero-based retry attempt
+        rate_limit_only: Only retry rate-limit responses (for non-idempotent writes,
+                         where a 5xx may hide a request that actually succeeded)
+        
+    Returns:
+        Seconds to sleep, or None if the call should not be retried
+    """
+    if error.status not in _RETRY_STATUSES:
+        return None
+    if rate_limit_only and error.status not in (403, 429):
+        return None
+    
+    headers = {k.lower(): v for k, v in (getattr(error, 'headers', None) or {}).items()}
+    backoff = _RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, 1)
+    
+    if headers.get('retry-after'):
+        wait = float(headers['retry-after'])
+    elif headers.get('x-ratelimit-remaining') == '0' and headers.get('x-ratelimit-reset'):
+        wait = int(headers['x-ratelimit-reset']) - time.time()
+    elif error.status == 403:
+        # Plain permission errors are not worth retrying
+        return None
+    else:
+        wait = 0
+    
+    delay = max(wait, backoff)
+    return delay if delay <= _MAX_RETRY_WAIT else None
+
+
+def _gh_retry(fn, idempotent=True):
+    """
+    Wrap a PyGithub call with exponential backoff that honors Retry-After / X-RateLimit-Reset
+    
+    Pass idempotent=False for writes such as creating a PR or deleting a file,
+    which are then retried only when rate limited.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except GithubException as e:
+                delay = _retry_delay(e, attempt, rate_limit_only=not idempotent) if attempt < _MAX_RETRIES else None
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.warning(f"GitHub API returned {e.status}, retrying in {delay:.1f}s (attempt {attempt}/{_MAX_RETRIES})")
+                time.sleep(delay)
+    return wrapper
+
+
+def _git_blob_sha(content):
+    """Compute the SHA git assigns to a blob with this content (bytes)"""
+    return hashlib.sha1(b"blob %d\0%s" % (len(content), content)).hexdigest()
+
+
+def _extract_prompt_keywords(text):
+    """
+    Extract file-selection keywords and the task type from a prompt
+    
+    Args:
+        text: User prompt or task description (may be empty)
+        
+    Returns:
+        Tuple of (set of lowercase keywords, task type string)
+    """
+    prompt_keywords = set()
+    task_type = "general"
+    if not text:
+        return prompt_keywords, task_type
+    
+    prompt_lower = text.lower()
+    
+    # Extract filename mentions (e.g., "auth.py", "user_service")
+    for f in _FILENAME_RE.findall(text):
+        prompt_keywords.add(f.lower())
+    
+    # Extract likely module/component names
+    for word in _WORD_RE.findall(prompt_lower):
+        if len(word) > 3:  # Skip short words
+            prompt_keywords.add(word)
+    
+    # Determine task type for extension priorities
+    task_type = next(
+        (tt for tt, pattern in _TASK_TYPE_RES.items() if pattern.search(prompt_lower)),
+        task_type
+    )
+    
+    return prompt_keywords, task_type
+
+
+@dataclass
+class PullRequestInfo:
+    """The pull request fields merge/info/revert need, from one GraphQL query"""
+    number: int
+    title: str
+    state: str  # "open" or "closed", as in the REST API
+    merged: bool
+    mergeable: object  # True, False, or None while GitHub is still computing it
+    html_url: str
+    head_ref: str
+    base_ref: str
+    author: str
+    created_at: datetime
+    body: str
+    merge_commit_sha: str = None
+    merged_at: datetime = None
+
+
 # Try to import AI agent (SpoonOS)
 try:
     from ai_agent import get_ai_code_generator
@@ -37,9 +274,19 @@ class GitHubPRHelper:
             repo_name: Repository name in format 'owner/repo'
             use_ai: Whether to use AI agent for code generation (default: True)
         """
-        self.github = Github(github_token)
+        self.github = Github(github_token, pool_size=_GITHUB_POOL_SIZE)
         self.repo_name = repo_name
         self.repo = self.github.get_repo(repo_name)
+        
+        # Cache repo metadata once; every later read comes from these fields
+        self._default_branch = self.repo.default_branch
+        self._language = self.repo.language
+        self._description = self.repo.description
+        # PR number -> (PullRequestInfo, fetched_at)
+        self._pr_cache: dict[int, tuple[PullRequestInfo, float]] = {}
+        # README.md / BOT_STATS.md path -> (blob sha, content bytes)
+        self._bookkeeping_blobs: dict[str, tuple[str, bytes]] = {}
+        
         self.use_ai = use_ai and AI_AGENT_AVAILABLE
         
         # Initialize AI agent if available
@@ -56,6 +303,72 @@ class GitHubPRHelper:
                 logger.warning(f"Failed to initialize AI generator: {e}")
                 self.use_ai = False
     
+    def _get_pull(self, pr_number):
+        """
+        Get the state of a pull request with a single GraphQL query, cached for a short TTL
+        
+        Args:
+            pr_number: PR number (int)
+            
+        Returns:
+            PullRequestInfo
+        """
+        cached = self._pr_cache.get(pr_number)
+        if cached and time.monotonic() - cached[1] < _PR_CACHE_TTL:
+            return cached[0]
+        
+        owner, name = self.repo_name.split("/", 1)
+        _, data = _gh_retry(self.repo._requester.requestJsonAndCheck)(
+            "POST",
+            "/graphql",
+            input={"query": _PR_INFO_QUERY, "variables": {"owner": owner, "name": name, "number": pr_number}}
+        )
+        # GraphQL reports errors (including "not found") with a 200 status
+        pr_data = ((data.get("data") or {}).get("repository") or {}).get("pullRequest")
+        if pr_data is None:
+            message = data["errors"][0]["message"] if data.get("errors") else f"PR #{pr_number} not found"
+            raise GithubException(404, {"message": message}, None)
+        
+        pr = PullRequestInfo(
+            number=pr_data["number"],
+            title=pr_data["title"],
+            state="open" if pr_data["state"] == "OPEN" else "closed",
+            merged=pr_data["merged"],
+            mergeable=_MERGEABLE_STATES.get(pr_data["mergeable"]),
+            html_url=pr_data["url"],
+            head_ref=pr_data["headRefName"],
+            base_ref=pr_data["baseRefName"],
+            author=(pr_data.get("author") or {}).get("login", "ghost"),
+            created_at=datetime.fromisoformat(pr_data["createdAt"]),
+            body=pr_data.get("body") or "",
+            merge_commit_sha=(pr_data.get("mergeCommit") or {}).get("oid"),
+            merged_at=datetime.fromisoformat(pr_data["mergedAt"]) if pr_data.get("mergedAt") else None
+        )
+        self._pr_cache[pr_number] = (pr, time.monotonic())
+        return pr
+    
+    def _get_tree_entries(self, ref):
+        """
+        Fetch the recursive tree of a ref as plain dicts
+        
+        Reads the raw JSON instead of wrapping every entry in a PyGithub
+        GitTreeElement, which adds up on trees with thousands of files.
+        
+        Args:
+            ref: Branch name or tree SHA
+            
+        Returns:
+            List of tree entry dicts (path, type, size, sha, ...)
+        """
+        _, data = _gh_retry(self.repo._requester.requestJsonAndCheck)(
+            "GET",
+            f"{self.repo.url}/git/trees/{ref}",
+            parameters={"recursive": "1"}
+        )
+        if data.get('truncated'):
+            logger.warning(f"Tree for {ref} was truncated by GitHub; scoring the first {len(data['tree'])} entries")
+        return data['tree']
+    
     def _get_full_codebase_context(self, branch_name="main", user_prompt=None):
         """
         Fetch codebase context using GitHub API (fast, no cloning)
@@ -74,131 +387,83 @@ class GitHubPRHelper:
                 logger.info(f"User prompt: {user_prompt[:100]}...")
             
             # Extract keywords from user prompt for smart file selection
-            prompt_keywords = set()
-            task_type = "general"
+            prompt_keywords, task_type = _extract_prompt_keywords(user_prompt)
             
-            if user_prompt:
-                prompt_lower = user_prompt.lower()
-                
-                # Extract filename mentions (e.g., "auth.py", "user_service")
-                import re
-                explicit_files = re.findall(r'[\w_/\-]+\.[\w]+', user_prompt)
-                for f in explicit_files:
-                    prompt_keywords.add(f.lower())
-                
-                # Extract likely module/component names
-                words = re.findall(r'\b[\w_]+\b', prompt_lower)
-                for word in words:
-                    if len(word) > 3:  # Skip short words
-                        prompt_keywords.add(word)
-                
-                # Determine task type for extension priorities
-                if any(kw in prompt_lower for kw in ['test', 'unit test', 'testing', 'pytest', 'jest']):
-                    task_type = "testing"
-                elif any(kw in prompt_lower for kw in ['ui', 'frontend', 'page', 'component', 'html', 'css', 'react', 'vue']):
-                    task_type = "frontend"
-                elif any(kw in prompt_lower for kw in ['api', 'endpoint', 'route', 'handler', 'controller']):
-                    task_type = "api"
-                elif any(kw in prompt_lower for kw in ['database', 'db', 'model', 'schema', 'migration', 'sql']):
-                    task_type = "database"
-                elif any(kw in prompt_lower for kw in ['auth', 'login', 'authentication', 'authorization', 'user']):
-                    task_type = "auth"
-                
+            if prompt_keywords:
                 logger.info(f"Task type: {task_type}, Keywords: {list(prompt_keywords)[:10]}")
             
             # Build context using GitHub API (much faster than cloning)
-            context_parts = [
-                f"Repository: {self.repo_name}",
-                f"Branch: {branch_name}",
-                f"Language: {self.repo.language or 'Multiple'}",
-                f"Description: {self.repo.description or 'No description'}",
-                ""
-            ]
-            
-            # File extensions to include (prioritized)
-            priority_extensions = {'.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.rs', '.java'}
-            secondary_extensions = {'.cpp', '.c', '.h', '.hpp', '.cs', '.rb', '.php', '.swift', '.kt', '.scala'}
-            config_extensions = {'.json', '.yaml', '.yml', '.toml', '.md', '.txt', '.sh', '.bash'}
-            
-            # Directories to skip
-            skip_dirs = {
-                'node_modules', '__pycache__', '.git', 'venv', '.venv',
-                'dist', 'build', 'target', '.idea', '.vscode', 'vendor',
-                'bin', 'obj', '.next', '.nuxt', 'coverage', 'test', 'tests',
-                '__tests__', 'spec', 'docs', '.github'
-            }
+            # Accumulated as bytes so fetched blobs are copied in without decoding
+            context_buf = bytearray(
+                f"Repository: {self.repo_name}\n"
+                f"Branch: {branch_name}\n"
+                f"Language: {self._language or 'Multiple'}\n"
+                f"Description: {self._description or 'No description'}\n".encode('utf-8')
+            )
             
             # Get repository tree using GitHub API (fast!)
             try:
-                tree = self.repo.get_git_tree(branch_name, recursive=True)
-            except:
-                # Fallback to default branch
-                tree = self.repo.get_git_tree(self.repo.default_branch, recursive=True)
+                tree_entries = self._get_tree_entries(branch_name)
+            except GithubException as e:
+                if e.status != 404 or branch_name == self._default_branch:
+                    raise
+                # Branch doesn't exist (yet); fall back to the default branch
+                tree_entries = self._get_tree_entries(self._default_branch)
             
-            # Collect and score files based on relevance
-            scored_files = []
+            task_boost_re = _TASK_PATH_BOOSTS.get(task_type)
             
-            for item in tree.tree:
-                if item.type == "blob":  # It's a file
-                    path = item.path
+            # Score files lazily; only the running top 2 are kept in memory
+            def iter_candidates():
+                for item in tree_entries:
+                    if item['type'] != "blob":  # Only files
+                        continue
+                    path = item['path']
+                    size = item.get('size') or 0
                     path_lower = path.lower()
                     
                     # Skip if in excluded directory or hidden
-                    if any(f'/{skip_dir}/' in f'/{path}/' or path.startswith(skip_dir) for skip_dir in skip_dirs):
+                    if _SKIP_RE.search(path):
                         continue
                     if path.startswith('.') and path != '.env.example':
                         continue
                     
                     # Check file size (skip large files)
-                    if item.size and item.size > 100 * 1024:  # Skip files > 100KB
+                    if size > 100 * 1024:  # Skip files > 100KB
                         continue
                     
-                    # Calculate relevance score
-                    score = 0
-                    _, ext = os.path.splitext(path)
+                    # Skip binary formats without spending a fetch on them
+                    _, ext = os.path.splitext(path_lower)
+                    if ext in _BINARY_EXTENSIONS:
+                        continue
                     
                     # Base score by extension relevance
-                    if ext in priority_extensions:
-                        score += 10
-                    elif ext in secondary_extensions:
-                        score += 5
-                    elif ext in config_extensions:
-                        score += 3
+                    score = _EXTENSION_SCORES.get(ext, 0)
                     
                     # Boost score based on task type
-                    if task_type == "testing" and ('test' in path_lower or 'spec' in path_lower):
-                        score += 20
-                    elif task_type == "frontend" and any(x in path_lower for x in ['component', 'page', 'view', 'ui', 'client', 'frontend']):
-                        score += 20
-                    elif task_type == "api" and any(x in path_lower for x in ['api', 'route', 'handler', 'controller', 'endpoint']):
-                        score += 20
-                    elif task_type == "database" and any(x in path_lower for x in ['model', 'schema', 'migration', 'database', 'db']):
-                        score += 20
-                    elif task_type == "auth" and any(x in path_lower for x in ['auth', 'login', 'user', 'session', 'token']):
+                    if task_boost_re and task_boost_re.search(path_lower):
                         score += 20
                     
                     # Boost score if filename/path contains keywords from prompt
+                    # Substring checks per keyword: overlapping keywords
+                    # ("auth" and "authentication") must each count
                     if prompt_keywords:
-                        path_parts = path_lower.replace('/', ' ').replace('_', ' ').replace('-', ' ').split()
-                        matches = sum(1 for keyword in prompt_keywords if keyword in path_parts or keyword in path_lower)
+                        matches = sum(kw in path_lower for kw in prompt_keywords)
                         score += matches * 15
                     
                     # Always include certain key files
-                    if path in ['README.md', 'package.json', 'requirements.txt', 'setup.py']:
+                    if path in _KEY_FILES:
                         score += 8
                     
                     # Prefer smaller files (usually more focused)
-                    size_penalty = (item.size or 0) // 10000  # -1 per 10KB
+                    size_penalty = size // 10000  # -1 per 10KB
                     score -= size_penalty
                     
                     if score > 0:
-                        scored_files.append((path, item.size or 0, score))
-            
-            # Sort by score (highest first), then by size (smaller first)
-            scored_files.sort(key=lambda x: (-x[2], x[1]))
+                        yield (path, size, score)
             
             # Select only top 2 most relevant files for speed
-            files_to_fetch = scored_files[:2]
+            # (highest score first, then smaller size first)
+            files_to_fetch = heapq.nsmallest(2, iter_candidates(), key=lambda x: (-x[2], x[1]))
             
             logger.info(f"Top 2 most relevant files:")
             for path, size, score in files_to_fetch:
@@ -218,23 +483,27 @@ class GitHubPRHelper:
                     break
                 
                 try:
-                    file_content = self.repo.get_contents(filepath, ref=branch_name)
-                    content = file_content.decoded_content.decode('utf-8', errors='ignore')
+                    file_content = _gh_retry(self.repo.get_contents)(filepath, ref=branch_name)
+                    raw = file_content.decoded_content
+                    
+                    # Skip binaries that slipped past the extension filter
+                    if b'\x00' in raw[:512]:
+                        logger.debug(f"Skipping binary file {filepath}")
+                        continue
                     
                     # Add to context
-                    context_parts.append(f"--- FILE: {filepath} ---")
-                    context_parts.append(content)
-                    context_parts.append(f"--- END FILE: {filepath} ---")
-                    context_parts.append("")
+                    context_buf += f"\n--- FILE: {filepath} ---\n".encode('utf-8')
+                    context_buf += raw
+                    context_buf += f"\n--- END FILE: {filepath} ---\n".encode('utf-8')
                     
-                    total_chars += len(content)
+                    total_chars += len(raw)
                     files_added += 1
                     
                 except Exception as e:
                     logger.debug(f"Could not read {filepath}: {e}")
                     continue
             
-            full_context = "\n".join(context_parts)
+            full_context = context_buf.decode('utf-8', errors='replace')
             
             logger.info(f"Built context: {files_added} files, {total_chars} chars (~{total_chars // 4} tokens)")
             
@@ -259,12 +528,12 @@ class GitHubPRHelper:
         def create_slug(text, max_length=30):
             """Create a URL-friendly slug from text"""
             # Remove bot mentions and common words
-            text = re.sub(r'<@[A-Z0-9]+>', '', text)
-            text = re.sub(r'\b(create|make|open|submit|generate|a|an|the|pr|pull request|for|to)\b', '', text, flags=re.IGNORECASE)
+            text = _MENTION_RE.sub('', text)
+            text = _STOPWORDS_RE.sub('', text)
             
             # Convert to lowercase and replace spaces/special chars with hyphens
-            slug = re.sub(r'[^\w\s-]', '', text.lower())
-            slug = re.sub(r'[-\s]+', '-', slug)
+            slug = _SLUG_STRIP_RE.sub('', text.lower())
+            slug = _SLUG_DASH_RE.sub('-', slug)
             slug = slug.strip('-')
             
             # Truncate to max_length
@@ -285,34 +554,37 @@ class GitHubPRHelper:
         if thread_context:
             hash_input += str(thread_context)
         
-        # Generate a short hash (first 8 characters)
-        context_hash = hashlib.md5(hash_input.encode('utf-8')).hexdigest()[:8]
+        # Generate a short hash (8 hex characters)
+        context_hash = hashlib.blake2b(hash_input.encode('utf-8'), digest_size=4).hexdigest()
         
         # Combine: bot-{slug}-{hash}
         branch_name = f"bot-{task_slug}-{context_hash}"
         
         # Ensure branch name is valid (GitHub has restrictions)
         # Remove any invalid characters
-        branch_name = re.sub(r'[^a-z0-9\-_]', '', branch_name.lower())
+        branch_name = _BRANCH_INVALID_RE.sub('', branch_name.lower())
         # Ensure it doesn't start with a dot or hyphen
         branch_name = branch_name.lstrip('.-')
         # Limit total length (GitHub allows up to 255, but keep it reasonable)
         if len(branch_name) > 100:
             branch_name = branch_name[:100].rstrip('-')
         
-        # Check if branch exists and append counter if needed
-        counter = 0
+        # List existing branches sharing this prefix once, then resolve
+        # collisions locally instead of probing each candidate over the API
         original_branch_name = branch_name
-        while counter < 100:  # Safety limit
-            try:
-                # Try to get the branch - if it exists, this will succeed
-                self.repo.get_branch(branch_name)
-                # Branch exists, try with counter
-                counter += 1
-                branch_name = f"{original_branch_name}-{counter}"
-            except GithubException:
-                # Branch doesn't exist, we can use this name
-                break
+        try:
+            existing = {
+                ref.ref.removeprefix('refs/heads/')
+                for ref in self.repo.get_git_matching_refs(f"heads/{original_branch_name}")
+            }
+        except GithubException:
+            # Empty repositories have no refs to collide with
+            existing = set()
+        
+        counter = 0
+        while branch_name in existing and counter < 100:  # Safety limit
+            counter += 1
+            branch_name = f"{original_branch_name}-{counter}"
         
         logger.info(f"Generated branch name: {branch_name} (from task: {task_description[:50]})")
         return branch_name
@@ -325,7 +597,7 @@ class GitHubPRHelper:
             dict with success status and the SHA of the initial commit
         """
         try:
-            default_branch = self.repo.default_branch or "main"
+            default_branch = self._default_branch or "main"
             logger.info(f"Initializing empty repository with default branch: {default_branch}")
             
             readme_content = f"""# {self.repo.name}
@@ -385,11 +657,13 @@ This repository was automatically initialized by the Slack Bot.
             branch_name = self._generate_branch_name(task_description, thread_context)
             
             # Get the default branch
-            default_branch = self.repo.default_branch
+            default_branch = self._default_branch
             
             # Try to get the base SHA - handle empty repos
             try:
-                base_sha = self.repo.get_branch(default_branch).commit.sha
+                # Always read the live head: a PR branched from a stale SHA would
+                # have its whole-file rewrites undo whatever merged since
+                base_sha = _gh_retry(self.repo.get_branch)(default_branch).commit.sha
             except GithubException as e:
                 if e.status == 404 and "Branch not found" in str(e.data):
                     # Repository is empty - initialize it first
@@ -402,6 +676,7 @@ This repository was automatically initialized by the Slack Bot.
                         }
                     base_sha = init_result["sha"]
                     default_branch = init_result["branch"]
+                    self._default_branch = default_branch
                     logger.info(f"✅ Repository initialized, proceeding with PR creation")
                 else:
                     raise
@@ -414,28 +689,8 @@ This repository was automatically initialized by the Slack Bot.
                 sha=base_sha
             )
             
-            # Extract the actual task from conversation history if it's a multi-line conversation
-            # Look for the original task description (usually in the first user message)
-            actual_task = task_description
-            if "\n\n" in task_description or "user:" in task_description.lower():
-                # This is a conversation history, extract the task
-                lines = task_description.split("\n")
-                for line in lines:
-                    line_lower = line.lower()
-                    if ("user:" in line_lower or "create" in line_lower or "make" in line_lower) and ("pr" in line_lower or "delete" in line_lower or "remove" in line_lower):
-                        # Extract the task part
-                        if ":" in line:
-                            actual_task = line.split(":", 1)[1].strip()
-                        else:
-                            actual_task = line.strip()
-                        break
-                # Also search the full text for deletion patterns
-                files_to_delete = self._detect_file_deletion(task_description)
-                if files_to_delete:
-                    # Use the full conversation for context, but prioritize deletion
-                    logger.info(f"Found deletion request in conversation: {files_to_delete}")
-            
-            # Make a random change to a file (use cached files if available)
+            # Make a random change to a file (use cached files if available).
+            # Deletion requests are detected there, once, and only when needed.
             change_result = self._make_random_change(branch_name, task_description, codebase_context, cached_files)
             
             if not change_result["success"]:
@@ -455,7 +710,7 @@ This repository was automatically initialized by the Slack Bot.
             logger.info(f"Change result: {change_result}")
             
             try:
-                pr = self.repo.create_pull(
+                pr = _gh_retry(self.repo.create_pull, idempotent=False)(
                     title=pr_title,
                     body=pr_body,
                     head=branch_name,
@@ -504,20 +759,8 @@ This repository was automatically initialized by the Slack Bot.
         Returns:
             List of file paths to delete, or empty list
         """
-        import re
         files_to_delete = []
         
-        # More flexible patterns to detect file deletion requests
-        # These patterns are more lenient to handle conversation formats
-        deletion_patterns = [
-            # Match "delete/remove [the] [file] <filename>"
-            r'(?:delete|remove)\s+(?:the\s+)?(?:file\s+)?([a-zA-Z0-9_/.-]+\.(?:py|js|ts|tsx|jsx|java|go|rs|md|txt|json|yaml|yml|xml|html|css|sh|bat|rb|php|cpp|c|h|hpp))',
-            # Match "<filename>" in quotes after delete/remove
-            r'(?:delete|remove)\s+["\']([a-zA-Z0-9_/.-]+\.[a-zA-Z0-9]+)["\']',
-            # Match file paths with directory
-            r'(?:delete|remove)\s+(?:the\s+)?(?:file\s+)?([a-zA-Z0-9_/-]+/[a-zA-Z0-9_/.-]+\.[a-zA-Z0-9]+)',
-        ]
-        
         # Process each line of the task description (in case it's multi-line conversation)
         lines = task_description.split('\n')
         logger.info(f"🔍 Checking {len(lines)} lines for file deletion patterns")
@@ -531,11 +774,8 @@ This repository was automatically initialized by the Slack Bot.
             
             logger.info(f"🔍 Found delete/remove keyword in line: {line[:150]}")
             
-            for pattern in deletion_patterns:
-                matches = re.findall(pattern, line_lower, re.IGNORECASE)
-                if matches:
-                    logger.info(f"Pattern '{pattern[:50]}...' matched: {matches}")
-                for match in matches:
+            for pattern in _DELETION_PATTERNS:
+                for match in pattern.findall(line_lower):
                     file_path = match.strip()
                     # Remove quotes if present
                     file_path = file_path.strip('"\'')
@@ -569,20 +809,33 @@ This repository was automatically initialized by the Slack Bot.
         
         deleted_files = []
         errors = []
+        task_desc_short = (task_description or "")[:50]
         
-        for file_path in files_to_delete:
+        def lookup_sha(file_path):
+            """Fetch the blob SHA of a file on the branch, returning (sha, error)"""
+            try:
+                return _gh_retry(self.repo.get_contents)(file_path, ref=branch_name).sha, None
+            except Exception as e:
+                return None, e
+        
+        # Existence checks are independent reads, so run them concurrently.
+        # Deletes stay sequential: each one commits onto the branch head.
+        with ThreadPoolExecutor(max_workers=_MAX_API_WORKERS) as executor:
+            lookups = list(executor.map(lookup_sha, files_to_delete))
+        
+        for file_path, (sha, lookup_error) in zip(files_to_delete, lookups):
             try:
                 logger.info(f"Attempting to delete: {file_path}")
-                # Check if file exists
                 try:
-                    existing_file = self.repo.get_contents(file_path, ref=branch_name)
-                    logger.info(f"File found on branch, SHA: {existing_file.sha}")
+                    if lookup_error:
+                        raise lookup_error
+                    logger.info(f"File found on branch, SHA: {sha}")
                     
                     # Delete the file
-                    self.repo.delete_file(
+                    _gh_retry(self.repo.delete_file, idempotent=False)(
                         path=file_path,
-                        message=f"🤖 Delete {file_path}: {task_description[:50]}",
-                        sha=existing_file.sha,
+                        message=f"🤖 Delete {file_path}: {task_desc_short}",
+                        sha=sha,
                         branch=branch_name
                     )
                     deleted_files.append(file_path)
@@ -595,9 +848,7 @@ This repository was automatically initialized by the Slack Bot.
                         logger.error(f"❌ GitHub API error deleting {file_path}: {e}")
                         errors.append(f"{file_path} ({str(e)})")
             except Exception as e:
-                logger.error(f"❌ Unexpected error deleting {file_path}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+                logger.exception(f"❌ Unexpected error deleting {file_path}: {e}")
                 errors.append(f"{file_path} ({str(e)})")
         
         if deleted_files:
@@ -661,17 +912,9 @@ This repository was automatically initialized by the Slack Bot.
                 except Exception as e:
                     logger.warning(f"AI generation error: {e}, falling back to placeholder")
             
-            # Fallback to random placeholder changes
+            # Fallback to placeholder bookkeeping changes
             logger.info("Using placeholder code generation")
-            change_options = [
-                self._add_comment_to_readme,
-                self._create_task_log_file,
-                self._update_bot_stats,
-            ]
-            
-            # Pick a random change type
-            change_func = random.choice(change_options)
-            return change_func(branch_name, task_description)
+            return self._commit_bot_housekeeping(branch_name, task_description)
             
         except Exception as e:
             logger.error(f"Error making change: {e}")
@@ -693,19 +936,17 @@ This repository was automatically initialized by the Slack Bot.
         Returns:
             dict with change details
         """
+        # Cached files from the preview go straight to GitHub; skip building
+        # the (potentially large) AI context entirely
+        if cached_files:
+            logger.info(f"✅ Using {len(cached_files)} cached file(s) from preview - NO AI CALL NEEDED")
+            return self._write_generated_files(branch_name, task_description, cached_files)
+        
         try:
-            # If we have cached files, use them directly!
-            if cached_files:
-                logger.info(f"✅ Using {len(cached_files)} cached file(s) from preview - NO AI CALL NEEDED")
-                result = {
-                    "success": True,
-                    "files": cached_files
-                }
-            else:
-                # Build comprehensive context for AI
-                if codebase_context:
-                    # Use the full codebase context provided
-                    repo_context = f"""Repository: {self.repo_name}
+            # Build comprehensive context for AI
+            if codebase_context:
+                # Use the full codebase context provided
+                repo_context = f"""Repository: {self.repo_name}
 Branch: {branch_name}
 
 FULL CODEBASE CONTEXT:
@@ -717,166 +958,270 @@ IMPORTANT: You have access to ALL existing files above.
 - You can DELETE code from existing files
 - Preserve existing functionality unless explicitly told to remove it
 """
-                    logger.info(f"Using full codebase context: {len(codebase_context)} characters")
-                else:
-                    # Fallback to minimal context
-                    repo_context = f"Repository: {self.repo_name}\nLanguage: Python\nBranch: {branch_name}"
-                    logger.warning("No codebase context provided - AI will have limited visibility")
-                
-                # Generate code using AI
-                logger.info(f"Generating code with AI for: {task_description}")
-                logger.info(f"Total context size: {len(repo_context)} characters")
-                
-                result = self.ai_generator.generate_code_sync(
-                    task_description=task_description,
-                    context=repo_context
-                )
+                logger.info(f"Using full codebase context: {len(codebase_context)} characters")
+            else:
+                # Fallback to minimal context
+                repo_context = f"Repository: {self.repo_name}\nLanguage: Python\nBranch: {branch_name}"
+                logger.warning("No codebase context provided - AI will have limited visibility")
+            
+            # Generate code using AI
+            logger.info(f"Generating code with AI for: {task_description}")
+            logger.info(f"Total context size: {len(repo_context)} characters")
+            
+            result = self.ai_generator.generate_code_sync(
+                task_description=task_description,
+                context=repo_context
+            )
             
             if not result.get("success") or not result.get("files"):
                 return {
                     "success": False,
                     "error": result.get("error", "No files generated")
                 }
+        except Exception as e:
+            logger.error(f"Error in AI code generation: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        return self._write_generated_files(branch_name, task_description, result["files"])
+    
+    def _read_branch_head(self, branch_name):
+        """
+        Read a branch's head commit and the blob SHA and mode of every file in it
+        
+        Args:
+            branch_name: Branch to read
             
-            # Create files in the repository
-            logger.info(f"Creating {len(result['files'])} file(s) on GitHub")
+        Returns:
+            Tuple of (git ref, head commit, dict of path -> blob SHA, dict of path -> file mode)
+        """
+        branch_ref = _gh_retry(self.repo.get_git_ref)(f"heads/{branch_name}")
+        base_commit = _gh_retry(self.repo.get_git_commit)(branch_ref.object.sha)
+        blob_entries = [
+            entry for entry in self._get_tree_entries(base_commit.tree.sha)
+            if entry['type'] == "blob"
+        ]
+        path_to_sha = {entry['path']: entry['sha'] for entry in blob_entries}
+        path_to_mode = {entry['path']: entry['mode'] for entry in blob_entries}
+        return branch_ref, base_commit, path_to_sha, path_to_mode
+    
+    def _upload_blobs(self, pending_blobs, path_to_mode):
+        """
+        Upload blobs concurrently
+        
+        Args:
+            pending_blobs: List of (path, utf-8 bytes)
+            path_to_mode: Existing file modes (from _read_branch_head); existing
+                          files keep theirs, e.g. an executable's 100755
             
+        Returns:
+            List of InputGitTreeElement, in the same order as pending_blobs
+        """
+        def create_blob(item):
+            # base64 keeps the JSON payload free of per-character escaping
+            return _gh_retry(self.repo.create_git_blob)(base64.b64encode(item[1]).decode('ascii'), "base64")
+        
+        with ThreadPoolExecutor(max_workers=_MAX_API_WORKERS) as executor:
+            blobs = list(executor.map(create_blob, pending_blobs))
+        
+        return [
+            InputGitTreeElement(path=file_path, mode=path_to_mode.get(file_path, "100644"), type="blob", sha=blob.sha)
+            for (file_path, _), blob in zip(pending_blobs, blobs)
+        ]
+    
+    def _commit_tree(self, branch_ref, base_commit, tree_elements, message):
+        """
+        Commit tree changes on top of base_commit and move the branch to it
+        
+        Args:
+            branch_ref: Git ref of the branch (from _read_branch_head)
+            base_commit: Current head commit of the branch
+            tree_elements: InputGitTreeElements to layer on the head's tree
+            message: Commit message
+            
+        Returns:
+            The new commit
+        """
+        new_tree = _gh_retry(self.repo.create_git_tree)(tree_elements, base_tree=base_commit.tree)
+        new_commit = _gh_retry(self.repo.create_git_commit)(
+            message=message,
+            tree=new_tree,
+            parents=[base_commit]
+        )
+        branch_ref.edit(new_commit.sha)
+        return new_commit
+    
+    def _write_generated_files(self, branch_name, task_description, files):
+        """
+        Write generated (or cached) files to the branch as a single commit
+        
+        Uses the Git Data API: one blob per written file, one tree on top of
+        the branch's current tree, one commit, one ref update.
+        
+        Args:
+            branch_name: Name of the branch to commit to
+            task_description: Task description from Slack
+            files: List of file dicts (path, content, description, action)
+            
+        Returns:
+            dict with change details
+        """
+        try:
+            logger.info(f"Committing {len(files)} file(s) to GitHub")
+            
+            # Current head of the branch and every existing path's blob SHA;
+            # the new tree is layered on the head's tree
+            branch_ref, base_commit, path_to_sha, path_to_mode = self._read_branch_head(branch_name)
+            
+            tree_elements = []
+            pending_blobs = []  # (path, utf-8 bytes) still to upload
             files_created = []
-            for i, file_info in enumerate(result["files"]):
+            for i, file_info in enumerate(files):
                 file_path = file_info["path"]
                 file_content = file_info["content"]
-                file_desc = file_info.get("description", "AI-generated code")
                 file_action = file_info.get("action", "NEW").upper()
                 
+                logger.info(f"File {i+1}/{len(files)}: {file_path} [{file_action}]")
+                
+                # Handle file deletion: a null SHA removes the path from the tree
+                if file_action == "DELETED":
+                    if file_path not in path_to_sha:
+                        logger.warning(f"  ⚠️  File not found, skipping: {file_path}")
+                        continue
+                    logger.info(f"  🗑️  Deleting file: {file_path}")
+                    tree_elements.append(InputGitTreeElement(path=file_path, mode="100644", type="blob", sha=None))
+                    files_created.append(f"Deleted {file_path}")
+                    continue
+                
                 # Fix escaped newlines if they exist (\\n -> \n)
-                # This handles cases where the AI output has literal \n strings
-                if isinstance(file_content, str):
-                    # Only replace if we detect escaped newlines
-                    if '\\n' in file_content and '\n' not in file_content:
-                        file_content = file_content.replace('\\n', '\n')
+                # This handles cases where the AI output has literal \n strings;
+                # content with real newlines is left alone without a second scan
+                if isinstance(file_content, str) and '\n' not in file_content:
+                    file_content, fixed = _ESCAPE_RE.subn('\n', file_content)
+                    if fixed:
                         logger.info(f"  Fixed escaped newlines in {file_path}")
                 
-                logger.info(f"File {i+1}/{len(result['files'])}: {file_path} [{file_action}]")
                 logger.info(f"  Content length: {len(file_content)} chars")
-                logger.info(f"  Content preview (first 200 chars): {file_content[:200]}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"  Content preview (first 200 chars): {file_content[:200]}")
                 
-                try:
-                    # Handle file deletion
-                    if file_action == "DELETED":
-                        logger.info(f"  🗑️  Deleting file: {file_path}")
-                        try:
-                            existing_file = self.repo.get_contents(file_path, ref=branch_name)
-                            self.repo.delete_file(
-                                path=file_path,
-                                message=f"🤖 Delete {file_path}: {task_description[:50]}",
-                                sha=existing_file.sha,
-                                branch=branch_name
-                            )
-                            files_created.append(f"Deleted {file_path}")
-                            logger.info(f"  ✅ Deleted file: {file_path}")
-                        except Exception as e:
-                            if "404" in str(e) or "Not Found" in str(e):
-                                logger.warning(f"  ⚠️  File not found, skipping: {file_path}")
-                            else:
-                                raise
-                        continue
-                    
-                    # Handle file creation/update
-                    try:
-                        existing_file = self.repo.get_contents(file_path, ref=branch_name)
-                        
-                        # Update existing file with AI-generated content
-                        self.repo.update_file(
-                            path=file_path,
-                            message=f"🤖 Update {file_path}: {task_description[:50]}",
-                            content=file_content,
-                            sha=existing_file.sha,
-                            branch=branch_name
-                        )
-                        files_created.append(f"Updated {file_path}")
-                        logger.info(f"  ✅ Updated existing file: {file_path}")
-                    except:
-                        # Create new file
-                        self.repo.create_file(
-                            path=file_path,
-                            message=f"🤖 Create {file_path}: {task_description[:50]}",
-                            content=file_content,
-                            branch=branch_name
-                        )
-                        files_created.append(f"Created {file_path}")
-                        logger.info(f"  ✅ Created new file: {file_path}")
-                    
-                except Exception as e:
-                    logger.error(f"  ❌ Failed to process {file_path}: {e}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+                # Identical content hashes to the same blob SHA; nothing to write
+                raw = file_content.encode('utf-8')
+                if path_to_sha.get(file_path) == _git_blob_sha(raw):
+                    logger.info(f"  ⏭️  {file_path} unchanged, skipping")
                     continue
+                
+                pending_blobs.append((file_path, raw))
+                files_created.append(f"{'Updated' if file_path in path_to_sha else 'Created'} {file_path}")
             
-            logger.info(f"File operations complete: {len(files_created)} file(s)")
+            # Blob uploads are independent, so send them concurrently
+            if pending_blobs:
+                tree_elements.extend(self._upload_blobs(pending_blobs, path_to_mode))
             
-            if files_created:
-                return {
-                    "success": True,
-                    "changes": f"AI-generated code: {', '.join(files_created)}"
-                }
-            else:
-                logger.error("No files were successfully created!")
+            if not tree_elements:
+                logger.error("No files were changed!")
                 return {
                     "success": False,
-                    "error": "Failed to create any files"
+                    "error": "Generated files are identical to the branch - nothing to commit"
                 }
-                
-        except Exception as e:
-            logger.error(f"Error in AI code generation: {e}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    def _add_comment_to_readme(self, branch_name, task_description):
-        """Add a timestamped comment to README"""
-        try:
-            # Get README file
-            readme = self.repo.get_contents("README.md", ref=branch_name)
             
-            # Add a comment at the end
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            new_content = readme.decoded_content.decode('utf-8')
-            comment = f"\n\n<!-- Bot task executed: {task_description[:100]} at {timestamp} -->"
-            new_content += comment
-            
-            # Update the file
-            self.repo.update_file(
-                path="README.md",
-                message=f"🤖 Add bot task comment: {task_description[:50]}",
-                content=new_content,
-                sha=readme.sha,
-                branch=branch_name
+            new_commit = self._commit_tree(
+                branch_ref,
+                base_commit,
+                tree_elements,
+                f"🤖 {task_description[:50]}\n\n" + "\n".join(files_created)
             )
             
+            logger.info(f"✅ Committed {len(files_created)} file(s) in {new_commit.sha[:7]}")
+            
             return {
                 "success": True,
-                "changes": f"Added comment to README.md"
+                "changes": f"AI-generated code: {', '.join(files_created)}"
             }
-            
+                
         except Exception as e:
-            logger.error(f"Error updating README: {e}")
+            logger.error(f"Error writing generated files: {e}")
             return {
                 "success": False,
                 "error": str(e)
             }
     
-    def _create_task_log_file(self, branch_name, task_description):
-        """Create a new task log file"""
+    def _commit_bot_housekeeping(self, branch_name, task_description):
+        """
+        Record a bot task as one commit: README comment, BOT_STATS.md bump
+        and a new task log file
+        
+        Args:
+            branch_name: Name of the branch to commit to
+            task_description: Task description from Slack
+            
+        Returns:
+            dict with change details
+        """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            filename = f"bot_tasks/task_{timestamp}.txt"
+            branch_ref, base_commit, path_to_sha, path_to_mode = self._read_branch_head(branch_name)
+            now = datetime.now()
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+            
+            # Only the two files we edit are read, and only if they exist
+            existing_paths = [p for p in ("README.md", "BOT_STATS.md") if p in path_to_sha]
+            
+            # Kept as bytes: both files are only appended to / patched in the header.
+            # Blob SHAs are content hashes, so a cached copy with the same SHA
+            # is exactly what GitHub would return
+            def read_blob(path):
+                cached = self._bookkeeping_blobs.get(path)
+                if cached and cached[0] == path_to_sha[path]:
+                    return cached[1]
+                blob = _gh_retry(self.repo.get_git_blob)(path_to_sha[path])
+                return base64.b64decode(blob.content)
+            
+            with ThreadPoolExecutor(max_workers=_MAX_API_WORKERS) as executor:
+                existing = dict(zip(existing_paths, executor.map(read_blob, existing_paths)))
+            
+            pending_blobs = []
+            changes = []
+            
+            # README: append a timestamped comment
+            if "README.md" in existing:
+                comment = f"\n\n<!-- Bot task executed: {task_description[:100]} at {timestamp} -->"
+                pending_blobs.append(("README.md", existing["README.md"] + comment.encode('utf-8')))
+                changes.append("Added comment to README.md")
+            
+            # BOT_STATS.md: bump the task count and prepend to the history.
+            # Only the header above "## Task History" is parsed or rewritten;
+            # the (ever-growing) history is copied through untouched
+            if "BOT_STATS.md" in existing:
+                header, marker, history = existing["BOT_STATS.md"].partition(b"## Task History")
+                match = _TOTAL_TASKS_RE.search(header)
+                count = int(match.group(1)) + 1 if match else 1
+                header = header.replace(b"Total Tasks: %d" % (count - 1), b"Total Tasks: %d" % count)
+                new_entry = f"\n\n- [{timestamp}] {task_description}".encode('utf-8') if marker else b""
+                stats = header + marker + new_entry + history
+            else:
+                stats = f"""# Bot Statistics
+
+Total Tasks: 1
+Last Updated: {timestamp}
+
+## Task History
+- [{timestamp}] {task_description}
+
+---
+*This file is automatically maintained by the Slack bot.*
+""".encode('utf-8')
+            pending_blobs.append(("BOT_STATS.md", stats))
+            changes.append("Updated bot statistics in BOT_STATS.md")
             
-            content = f"""Bot Task Log
+            # Task log: a new file per task
+            log_filename = f"bot_tasks/task_{now.strftime('%Y%m%d-%H%M%S')}.txt"
+            log_content = f"""Bot Task Log
 ================
 
 Task: {task_description}
-Timestamp: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+Timestamp: {timestamp}
 Status: Pending Implementation
 
 Description:
@@ -886,93 +1231,28 @@ Description:
 This file was automatically generated by the Slack bot.
 The actual implementation logic will be added in future iterations.
 """
-            
-            # Create the file
-            self.repo.create_file(
-                path=filename,
-                message=f"🤖 Create task log: {task_description[:50]}",
-                content=content,
-                branch=branch_name
+            pending_blobs.append((log_filename, log_content.encode('utf-8')))
+            changes.append(f"Created new file: {log_filename}")
+            
+            self._commit_tree(
+                branch_ref,
+                base_commit,
+                self._upload_blobs(pending_blobs, path_to_mode),
+                f"🤖 Record bot task: {task_description[:50]}"
             )
             
-            return {
-                "success": True,
-                "changes": f"Created new file: {filename}"
-            }
-            
-        except Exception as e:
-            logger.error(f"Error creating task file: {e}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    def _update_bot_stats(self, branch_name, task_description):
-        """Update or create a bot statistics file"""
-        try:
-            filename = "BOT_STATS.md"
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Try to get existing file
-            try:
-                stats_file = self.repo.get_contents(filename, ref=branch_name)
-                existing_content = stats_file.decoded_content.decode('utf-8')
-                
-                # Parse task count
-                if "Total Tasks:" in existing_content:
-                    # Extract current count
-                    import re
-                    match = re.search(r'Total Tasks: (\d+)', existing_content)
-                    count = int(match.group(1)) + 1 if match else 1
-                else:
-                    count = 1
-                
-                # Append new task
-                new_entry = f"\n- [{timestamp}] {task_description}"
-                new_content = existing_content.replace(
-                    "## Task History",
-                    f"## Task History\n{new_entry}"
-                ).replace(
-                    f"Total Tasks: {count-1}",
-                    f"Total Tasks: {count}"
-                )
-                
-                # Update file
-                self.repo.update_file(
-                    path=filename,
-                    message=f"🤖 Update bot stats: task #{count}",
-                    content=new_content,
-                    sha=stats_file.sha,
-                    branch=branch_name
-                )
-                
-            except GithubException:
-                # File doesn't exist, create it
-                content = f"""# Bot Statistics
-
-Total Tasks: 1
-Last Updated: {timestamp}
-
-## Task History
-- [{timestamp}] {task_description}
-
----
-*This file is automatically maintained by the Slack bot.*
-"""
-                self.repo.create_file(
-                    path=filename,
-                    message=f"🤖 Create bot stats file",
-                    content=content,
-                    branch=branch_name
-                )
+            # Remember what we just wrote so the next task can skip the reads
+            for path, raw in pending_blobs:
+                if path in ("README.md", "BOT_STATS.md"):
+                    self._bookkeeping_blobs[path] = (_git_blob_sha(raw), raw)
             
             return {
                 "success": True,
-                "changes": f"Updated bot statistics in {filename}"
+                "changes": "; ".join(changes)
             }
             
         except Exception as e:
-            logger.error(f"Error updating bot stats: {e}")
+            logger.error(f"Error committing bot housekeeping: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -1027,7 +1307,7 @@ Currently, this PR demonstrates the bot's ability to:
             pr_number = int(pr_number)
             
             # Get the pull request
-            pr = self.repo.get_pull(pr_number)
+            pr = self._get_pull(pr_number)
             
             # Check if PR is already merged
             if pr.merged:
@@ -1052,16 +1332,20 @@ Currently, this PR demonstrates the bot's ability to:
             
             # Get PR details before merging
             pr_title = pr.title
-            pr_branch = pr.head.ref
+            pr_branch = pr.head_ref
             pr_url = pr.html_url
             
             # Merge the PR
-            merge_result = pr.merge(
-                commit_title=f"Merge pull request #{pr_number}",
-                merge_method=merge_method
+            _, merge_result = self.repo._requester.requestJsonAndCheck(
+                "PUT",
+                f"{self.repo.url}/pulls/{pr_number}/merge",
+                input={"commit_title": f"Merge pull request #{pr_number}", "merge_method": merge_method}
             )
             
-            logger.info(f"PR #{pr_number} merged successfully: {merge_result.sha}")
+            # The cached PR object still says "open"; drop it
+            self._pr_cache.pop(pr_number, None)
+            
+            logger.info(f"PR #{pr_number} merged successfully: {merge_result['sha']}")
             
             return {
                 "success": True,
@@ -1069,7 +1353,7 @@ Currently, this PR demonstrates the bot's ability to:
                 "pr_title": pr_title,
                 "pr_url": pr_url,
                 "branch_name": pr_branch,
-                "merge_sha": merge_result.sha,
+                "merge_sha": merge_result['sha'],
                 "merge_method": merge_method
             }
             
@@ -1104,7 +1388,7 @@ Currently, this PR demonstrates the bot's ability to:
         """
         try:
             pr_number = int(pr_number)
-            pr = self.repo.get_pull(pr_number)
+            pr = self._get_pull(pr_number)
             
             return {
                 "success": True,
@@ -1114,9 +1398,9 @@ Currently, this PR demonstrates the bot's ability to:
                 "merged": pr.merged,
                 "mergeable": pr.mergeable,
                 "url": pr.html_url,
-                "branch": pr.head.ref,
-                "base": pr.base.ref,
-                "user": pr.user.login,
+                "branch": pr.head_ref,
+                "base": pr.base_ref,
+                "user": pr.author,
                 "created_at": pr.created_at.strftime("%Y-%m-%d %H:%M:%S"),
                 "body": pr.body or "No description provided"
             }
@@ -1132,48 +1416,93 @@ Currently, this PR demonstrates the bot's ability to:
                 "error": str(e)
             }
     
-    def create_revert_pr(self, pr_number):
+    def _revert_with_git_data(self, merge_commit_sha, default_branch, revert_branch_name, message):
         """
-        Create a revert PR for an existing merged PR using actual git revert
+        Revert a merge commit on top of the default branch without cloning
+        
+        Equivalent to `git revert -m 1` when none of the files the merge touched
+        have changed on the default branch since: every such path is set back
+        to its first-parent version in a single new commit.
         
         Args:
-            pr_number: PR number to revert (must be merged)
+            merge_commit_sha: SHA of the PR's merge commit
+            default_branch: Branch to revert on
+            revert_branch_name: Name of the branch to create
+            message: Commit message for the revert commit
             
         Returns:
-            dict with revert PR details or error
+            True if the revert branch was created, False if a three-way merge is
+            needed (caller should fall back to a clone), None if there is nothing to revert
+        """
+        def tree_map(tree_sha):
+            return {
+                entry['path']: (entry['type'], entry['mode'], entry['sha'])
+                for entry in self._get_tree_entries(tree_sha)
+                if entry['type'] != "tree"
+            }
+        
+        # The merge commit, the head and the three trees are independent reads;
+        # overlap them instead of paying each round trip in turn
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            merge_future = executor.submit(_gh_retry(self.repo.get_git_commit), merge_commit_sha)
+            # Read the head fresh: the conflict check below must see the latest tree
+            head_sha = _gh_retry(self.repo.get_git_ref)(f"heads/{default_branch}").object.sha
+            head_future = executor.submit(_gh_retry(self.repo.get_git_commit), head_sha)
+            merge_commit = merge_future.result()
+            
+            merged_future = executor.submit(tree_map, merge_commit.tree.sha)
+            before_future = executor.submit(tree_map, merge_commit.parents[0].tree.sha)
+            head_commit = head_future.result()
+            head_tree_future = None
+            if head_sha != merge_commit_sha:
+                head_tree_future = executor.submit(tree_map, head_commit.tree.sha)
+            merged, before = merged_future.result(), before_future.result()
+            head = head_tree_future.result() if head_tree_future else merged
+        
+        tree_elements = []
+        for path in merged.keys() | before.keys():
+            if merged.get(path) == before.get(path):
+                continue
+            # Touched again after the merge: needs a real three-way merge
+            if head.get(path) != merged.get(path):
+                return False
+            if path in before:
+                entry_type, mode, sha = before[path]
+                tree_elements.append(InputGitTreeElement(path=path, mode=mode, type=entry_type, sha=sha))
+            else:
+                entry_type, mode, _ = merged[path]
+                tree_elements.append(InputGitTreeElement(path=path, mode=mode, type=entry_type, sha=None))
+        
+        if not tree_elements:
+            logger.warning("Revert had no effect - nothing to commit")
+            return None
+        
+        new_tree = _gh_retry(self.repo.create_git_tree)(tree_elements, base_tree=head_commit.tree)
+        new_commit = _gh_retry(self.repo.create_git_commit)(
+            message=message,
+            tree=new_tree,
+            parents=[head_commit]
+        )
+        self.repo.create_git_ref(ref=f"refs/heads/{revert_branch_name}", sha=new_commit.sha)
+        logger.info(f"Created revert commit {new_commit.sha[:7]} on {revert_branch_name} via Git Data API")
+        return True
+    
+    def _revert_with_clone(self, pr_number, original_pr, merge_commit_sha, default_branch, revert_branch_name):
+        """
+        Revert a merge commit with `git revert -m 1` in a temporary clone and push the branch
+        
+        Args:
+            pr_number: PR number being reverted
+            original_pr: The merged PullRequest
+            merge_commit_sha: SHA of the PR's merge commit
+            default_branch: Branch to revert on
+            revert_branch_name: Name of the branch to push
+            
+        Returns:
+            dict with success status, or error
         """
         temp_dir = None
         try:
-            pr_number = int(pr_number)
-            
-            # Get the original pull request
-            original_pr = self.repo.get_pull(pr_number)
-            
-            # Check if PR is merged
-            if not original_pr.merged:
-                return {
-                    "success": False,
-                    "error": f"PR #{pr_number} is not merged yet. Only merged PRs can be reverted."
-                }
-            
-            # Get the merge commit
-            merge_commit_sha = original_pr.merge_commit_sha
-            
-            if not merge_commit_sha:
-                return {
-                    "success": False,
-                    "error": f"Could not find merge commit for PR #{pr_number}"
-                }
-            
-            # Get the default branch
-            default_branch = self.repo.default_branch
-            
-            # Create a new branch name for the revert
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            revert_branch_name = f"revert-pr-{pr_number}-{timestamp}"
-            
-            logger.info(f"Creating revert branch {revert_branch_name} to revert {merge_commit_sha}")
-            
             # Clone the repository to a temporary directory
             temp_dir = tempfile.mkdtemp()
             logger.info(f"Cloning repository to {temp_dir}")
@@ -1187,8 +1516,24 @@ Currently, this PR demonstrates the bot's ability to:
             else:
                 repo_url = f"https://github.com/{self.repo_name}.git"
             
-            # Clone the repo
-            local_repo = Repo.clone_from(repo_url, temp_dir, branch=default_branch)
+            # Partial, shallow clone: commits and trees only, blobs fetched on demand
+            local_repo = Repo.clone_from(
+                repo_url,
+                temp_dir,
+                branch=default_branch,
+                multi_options=[f'--depth={_CLONE_DEPTH}', '--single-branch', '--filter=blob:none', '--no-tags']
+            )
+            
+            # The merge commit and its first parent must be inside the shallow history
+            for _ in range(_CLONE_DEEPEN_ATTEMPTS):
+                try:
+                    local_repo.git.cat_file('-e', f"{merge_commit_sha}^1")
+                    break
+                except GitCommandError:
+                    logger.info(f"Merge commit not in shallow clone, deepening by {_CLONE_DEEPEN}")
+                    local_repo.git.fetch(f'--deepen={_CLONE_DEEPEN}', 'origin', default_branch)
+            else:
+                local_repo.git.fetch('--unshallow', 'origin', default_branch)
             
             # Configure git user for the commit
             with local_repo.config_writer() as git_config:
@@ -1243,6 +1588,72 @@ Currently, this PR demonstrates the bot's ability to:
             
             logger.info(f"Successfully pushed revert branch")
             
+            return {"success": True}
+        finally:
+            # Clean up temporary directory
+            if temp_dir and os.path.exists(temp_dir):
+                try:
+                    shutil.rmtree(temp_dir)
+                    logger.info(f"Cleaned up temporary directory {temp_dir}")
+                except Exception as e:
+                    logger.warning(f"Failed to clean up temp directory: {e}")
+    
+    def create_revert_pr(self, pr_number):
+        """
+        Create a revert PR for an existing merged PR using actual git revert
+        
+        Args:
+            pr_number: PR number to revert (must be merged)
+            
+        Returns:
+            dict with revert PR details or error
+        """
+        try:
+            pr_number = int(pr_number)
+            
+            # Get the original pull request
+            original_pr = self._get_pull(pr_number)
+            
+            # Check if PR is merged
+            if not original_pr.merged:
+                return {
+                    "success": False,
+                    "error": f"PR #{pr_number} is not merged yet. Only merged PRs can be reverted."
+                }
+            
+            # Get the merge commit
+            merge_commit_sha = original_pr.merge_commit_sha
+            
+            if not merge_commit_sha:
+                return {
+                    "success": False,
+                    "error": f"Could not find merge commit for PR #{pr_number}"
+                }
+            
+            # Get the default branch
+            default_branch = self._default_branch
+            
+            # Create a new branch name for the revert
+            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            revert_branch_name = f"revert-pr-{pr_number}-{timestamp}"
+            
+            logger.info(f"Creating revert branch {revert_branch_name} to revert {merge_commit_sha}")
+            
+            # Build the revert commit through the Git Data API; only fall back to
+            # a local clone when the reverted files changed again after the merge
+            revert_message = f"Revert PR #{pr_number}: {original_pr.title}\n\nThis reverts pull request #{pr_number}."
+            reverted = self._revert_with_git_data(merge_commit_sha, default_branch, revert_branch_name, revert_message)
+            if reverted is None:
+                return {
+                    "success": False,
+                    "error": f"PR #{pr_number} cannot be reverted - no changes were made. The PR may be empty or already reverted."
+                }
+            if not reverted:
+                logger.info("Files changed since the merge, falling back to git revert in a clone")
+                clone_result = self._revert_with_clone(pr_number, original_pr, merge_commit_sha, default_branch, revert_branch_name)
+                if not clone_result["success"]:
+                    return clone_result
+            
             # Create the revert pull request
             revert_pr_title = f"Revert PR #{pr_number}: {original_pr.title}"
             revert_pr_body = f"""## 🔄 Revert Pull Request
@@ -1272,7 +1683,7 @@ This undoes all changes introduced by PR #{pr_number}.
 *Generated automatically by Slack Bot 🤖*
 """
             
-            revert_pr = self.repo.create_pull(
+            revert_pr = _gh_retry(self.repo.create_pull, idempotent=False)(
                 title=revert_pr_title,
                 body=revert_pr_body,
                 head=revert_branch_name,
@@ -1316,12 +1727,4 @@ This undoes all changes introduced by PR #{pr_number}.
                 "success": False,
                 "error": str(e)
             }
-        finally:
-            # Clean up temporary directory
-            if temp_dir and os.path.exists(temp_dir):
-                try:
-                    shutil.rmtree(temp_dir)
-                    logger.info(f"Cleaned up temporary directory {temp_dir}")
-                except Exception as e:
-                    logger.warning(f"Failed to clean up temp directory: {e}")
 
@@ -7,16 +7,110 @@ instead of using a shared bot token.
 
 import os
 import json
+import asyncio
+import atexit
+import contextlib
 import logging
 import secrets
+import threading
+import time
 from pathlib import Path
 from typing import Optional, Dict
 from datetime import datetime
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 logger = logging.getLogger(__name__)
 
-# Storage for user GitHub tokens
-USER_DATA_FILE = Path("data/user_github_tokens.json")
+# Use orjson for token files when installed (faster parse/serialize, bytes in and out)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Storage for user GitHub tokens: one JSON file per Slack user
+USER_DATA_DIR = Path("data/user_tokens")
+# Pre-sharding single-file store, split into USER_DATA_DIR on first start
+LEGACY_USER_DATA_FILE = Path("data/user_github_tokens.json")
+
+# Writes requested within this window are coalesced into one flush
+_SAVE_DEBOUNCE_SECONDS = 0.2
+# user_tokens.get() default for users whose file hasn't been read yet
+_NOT_LOADED = object()
+
+# Pooled session for github.com / api.github.com calls. urllib3 doesn't retry
+# POST by default, so one-time OAuth codes are never replayed.
+_GH_SESSION = requests.Session()
+_GH_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504))
+))
+
+# OAuth states (CSRF tokens) expire after this long; the table is also capped
+_OAUTH_STATE_TTL_SECONDS = 600
+_MAX_OAUTH_STATES = 10000
+
+# Expiring GitHub tokens are refreshed this long before they run out
+_TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+# Upper bound on each token exchange / refresh / user lookup against GitHub
+_GITHUB_HTTP_TIMEOUT_SECONDS = 10
+
+
+# Unchanging parts of the "connect GitHub" message, built once and shared
+# (never mutated; Slack only serializes them)
+_AUTH_INFO_BLOCKS = (
+    {
+        "type": "divider"
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "*🔐 Why do I need to authenticate?*\n\n"
+                    "• The bot creates PRs on *your behalf* in *your repositories*\n"
+                    "• Your code stays private and secure\n"
+                    "• Each team member has their own permissions"
+        }
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "*✨ What you'll be able to do:*\n\n"
+                    "• 🤖 Generate code with AI\n"
+                    "• 📝 Create pull requests\n"
+                    "• 🔀 Merge and revert PRs\n"
+                    "• 📊 View your activity dashboard"
+        }
+    },
+)
+_AUTH_FOOTER_BLOCK = {
+    "type": "context",
+    "elements": [
+        {
+            "type": "mrkdwn",
+            "text": "_After authenticating, come back here and mention me again!_"
+        }
+    ]
+}
+
+
+def _read_json(path: Path):
+    """Parse a JSON file, with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return json.loads(path.read_text())
+
+
+def _dump_json(data) -> bytes:
+    """Serialize compact JSON to bytes, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
 
 
 class GitHubAuthManager:
@@ -28,47 +122,233 @@ class GitHubAuthManager:
         self.github_client_secret = os.environ.get("GITHUB_OAUTH_CLIENT_SECRET")
         self.oauth_callback_url = os.environ.get("GITHUB_OAUTH_CALLBACK_URL", "http://localhost:5050/auth/github/callback")
         
-        # In-memory state storage (now safe since everything's in one process)
+        # In-memory state storage (now safe since everything's in one process):
+        # state -> (slack_user_id, created monotonic time), oldest first
         self.oauth_states = {}
         
         # Ensure data directory exists
-        USER_DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
+        USER_DATA_DIR.mkdir(parents=True, exist_ok=True)
+        self._migrate_legacy_tokens()
+        
+        # Users loaded so far; shards are read on first access. None marks a
+        # user without a file, or a disconnected one whose file the next flush deletes
+        self.user_tokens = {}
+        # Resolved repo per (user, channel); dropped for a user whenever their data changes
+        self._repo_cache = {}
         
-        # Load existing user tokens
-        self.user_tokens = self._load_user_tokens()
+        # Guards user_tokens and the pending-save state: the OAuth callback and
+        # Slack handlers mutate users from different threads. Reentrant so a
+        # mutation can schedule its save while holding it.
+        self._lock = threading.RLock()
+        # Debounced persistence: mutations mark a user dirty and schedule one delayed flush
+        self._save_timer = None
+        self._dirty_users = set()
+        # Depth of nested bulk_update() blocks; saves are held until it drops to 0
+        self._suspend_save = 0
+        atexit.register(self._flush)
+        # Per-user locks serializing token refreshes, so concurrent requests refresh
+        # a user only once without one slow refresh blocking every other user
+        self._refresh_locks = {}
     
-    def _load_user_tokens(self) -> Dict:
-        """Load user tokens from disk"""
+    @staticmethod
+    def _user_file(slack_user_id: str) -> Path:
+        """Path of a user's token file"""
+        return USER_DATA_DIR / f"{slack_user_id}.json"
+    
+    def _migrate_legacy_tokens(self):
+        """Split the old single-file token store into per-user files (one-shot)"""
+        if not LEGACY_USER_DATA_FILE.exists():
+            return
         try:
-            if USER_DATA_FILE.exists():
-                with open(USER_DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                logger.info(f"Loaded {len(data)} user GitHub tokens")
-                return data
-            return {}
+            data = _read_json(LEGACY_USER_DATA_FILE)
+            for slack_user_id, user_data in data.items():
+                self._write_user_file(slack_user_id, user_data)
+            LEGACY_USER_DATA_FILE.rename(LEGACY_USER_DATA_FILE.with_suffix('.json.migrated'))
+            logger.info(f"Migrated {len(data)} user GitHub tokens to {USER_DATA_DIR}")
         except Exception as e:
-            logger.error(f"Error loading user tokens: {e}")
-            return {}
+            logger.error(f"Error migrating user tokens: {e}")
     
-    def _save_user_tokens(self):
-        """Save user tokens to disk"""
+    def _get_user(self, slack_user_id: str) -> Optional[Dict]:
+        """Get a user's stored data, reading their file on first access"""
+        # A None entry is a known miss: a user with no file, or a disconnected
+        # user whose file may not be deleted yet
+        user_data = self.user_tokens.get(slack_user_id, _NOT_LOADED)
+        if user_data is not _NOT_LOADED:
+            return user_data
+        with self._lock:
+            if slack_user_id in self.user_tokens:
+                return self.user_tokens[slack_user_id]
+            user_file = self._user_file(slack_user_id)
+            file_missing = False
+            try:
+                if user_file.exists():
+                    user_data = _read_json(user_file)
+                    return self.user_tokens.setdefault(slack_user_id, user_data)
+                file_missing = True
+            except Exception as e:
+                logger.error(f"Error loading GitHub token for user {slack_user_id}: {e}")
+            user_data = self._recover_user_file(slack_user_id)
+            if user_data is not None:
+                return self.user_tokens.setdefault(slack_user_id, user_data)
+            if file_missing:
+                # Unreadable files are retried; a missing one is remembered until
+                # handle_oauth_callback stores the user
+                self.user_tokens[slack_user_id] = None
+        return None
+    
+    def _recover_user_file(self, slack_user_id: str) -> Optional[Dict]:
+        """Promote a complete leftover .tmp write when the user's file is missing or unreadable"""
+        user_file = self._user_file(slack_user_id)
+        tmp_path = user_file.with_suffix('.tmp')
+        if not tmp_path.exists():
+            return None
         try:
-            with open(USER_DATA_FILE, 'w') as f:
-                json.dump(self.user_tokens, f, indent=2)
-            logger.info(f"Saved {len(self.user_tokens)} user GitHub tokens")
-        except Exception as e:
-            logger.error(f"Error saving user tokens: {e}")
+            user_data = _read_json(tmp_path)
+        except Exception:
+            # Partial write from a crash: the previous file (if any) is still authoritative
+            tmp_path.unlink(missing_ok=True)
+            return None
+        os.replace(tmp_path, user_file)
+        logger.info(f"Recovered GitHub token file for user {slack_user_id} from interrupted write")
+        return user_data
+    
+    def _write_user_file(self, slack_user_id: str, user_data: Optional[Dict]):
+        """Atomically write (or remove, if user_data is None) one user's file"""
+        user_file = self._user_file(slack_user_id)
+        if user_data is None:
+            user_file.unlink(missing_ok=True)
+            return
+        tmp_path = user_file.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_dump_json(user_data))
+            f.flush()
+            # Data must be on disk before the rename, or a crash can leave an empty file
+            os.fsync(f.fileno())
+        os.replace(tmp_path, user_file)
+    
+    def _save_user(self, slack_user_id: str):
+        """Schedule a save of one user's data (coalesced with other saves in the window)"""
+        with self._lock:
+            self._dirty_users.add(slack_user_id)
+            if self._save_timer is None and not self._suspend_save:
+                self._save_timer = threading.Timer(_SAVE_DEBOUNCE_SECONDS, self._flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def _flush(self):
+        """Write every pending user's file now"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            dirty_users, self._dirty_users = self._dirty_users, set()
+            for slack_user_id in dirty_users:
+                try:
+                    self._write_user_file(slack_user_id, self.user_tokens.get(slack_user_id))
+                except Exception as e:
+                    logger.error(f"Error saving GitHub token for user {slack_user_id}: {e}")
+            if dirty_users:
+                logger.info(f"Saved GitHub tokens for {len(dirty_users)} user(s)")
+    
+    @contextlib.contextmanager
+    def bulk_update(self):
+        """
+        Hold saves while applying many changes, then write each touched user once
+        
+        Usage:
+            with auth_manager.bulk_update():
+                for channel_id in channels:
+                    auth_manager.set_user_repo(user_id, repo, channel_id)
+        """
+        with self._lock:
+            self._suspend_save += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._suspend_save -= 1
+                if not self._suspend_save:
+                    self._flush()
     
     def is_user_authenticated(self, slack_user_id: str) -> bool:
         """Check if a user has connected their GitHub account"""
-        return slack_user_id in self.user_tokens
+        return self._get_user(slack_user_id) is not None
     
     def get_user_token(self, slack_user_id: str) -> Optional[str]:
-        """Get a user's GitHub token"""
-        user_data = self.user_tokens.get(slack_user_id)
-        if user_data:
-            return user_data.get("github_token")
-        return None
+        """Get a user's GitHub token, refreshing it first if it's about to expire"""
+        user_data = self._get_user(slack_user_id)
+        if not user_data:
+            return None
+        token = user_data.get("github_token")
+        expires_at = user_data.get("access_token_expires_at")
+        if expires_at and time.time() >= expires_at - _TOKEN_REFRESH_MARGIN_SECONDS:
+            token = self._refresh_user_token(slack_user_id, token) or token
+        return token
+    
+    @staticmethod
+    def _token_expiry_fields(token_data: Dict) -> Dict:
+        """Refresh token and absolute expiry times from a GitHub token response (empty for non-expiring tokens)"""
+        if "refresh_token" not in token_data:
+            return {}
+        now = time.time()
+        return {
+            "refresh_token": token_data["refresh_token"],
+            "access_token_expires_at": now + int(token_data.get("expires_in", 0)),
+            "refresh_token_expires_at": now + int(token_data.get("refresh_token_expires_in", 0)),
+        }
+    
+    def _refresh_user_token(self, slack_user_id: str, stale_token: Optional[str] = None) -> Optional[str]:
+        """
+        Exchange a user's refresh token for a new access token
+        
+        Args:
+            slack_user_id: Slack user ID
+            stale_token: The token that was found expired/rejected. If the stored
+                        token already differs, another request refreshed it.
+            
+        Returns:
+            New access token, or None if the user has no usable refresh token
+        """
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault(slack_user_id, threading.Lock())
+        with refresh_lock:
+            user_data = self._get_user(slack_user_id)
+            if not user_data or not user_data.get("refresh_token"):
+                return None
+            if stale_token and user_data.get("github_token") != stale_token:
+                return user_data.get("github_token")
+            if time.time() >= user_data.get("refresh_token_expires_at", 0):
+                logger.info(f"Refresh token expired for user {slack_user_id}")
+                return None
+            
+            try:
+                token_response = _GH_SESSION.post(
+                    "https://github.com/login/oauth/access_token",
+                    headers={"Accept": "application/json"},
+                    data={
+                        "client_id": self.github_client_id,
+                        "client_secret": self.github_client_secret,
+                        "grant_type": "refresh_token",
+                        "refresh_token": user_data["refresh_token"]
+                    },
+                    timeout=_GITHUB_HTTP_TIMEOUT_SECONDS
+                )
+                token_data = token_response.json()
+            except Exception as e:
+                logger.error(f"Error refreshing GitHub token for user {slack_user_id}: {e}")
+                return None
+            
+            if "access_token" not in token_data:
+                logger.error(f"Failed to refresh GitHub token for user {slack_user_id}: {token_data.get('error_description', 'Unknown error')}")
+                return None
+            
+            with self._lock:
+                user_data["github_token"] = token_data["access_token"]
+                user_data.update(self._token_expiry_fields(token_data))
+                self._save_user(slack_user_id)
+            
+            logger.info(f"Refreshed GitHub token for user {slack_user_id}")
+            return token_data["access_token"]
     
     def get_user_repo(self, slack_user_id: str, channel_id: Optional[str] = None) -> Optional[str]:
         """
@@ -82,7 +362,20 @@ class GitHubAuthManager:
         Returns:
             Repository in format "owner/repo" or None
         """
-        user_data = self.user_tokens.get(slack_user_id)
+        key = (slack_user_id, channel_id)
+        try:
+            return self._repo_cache[key]
+        except KeyError:
+            pass
+        
+        with self._lock:
+            repo = self._resolve_user_repo(slack_user_id, channel_id)
+            self._repo_cache[key] = repo
+        return repo
+    
+    def _resolve_user_repo(self, slack_user_id: str, channel_id: Optional[str]) -> Optional[str]:
+        """Look up a user's repo for a channel from their stored data"""
+        user_data = self._get_user(slack_user_id)
         if not user_data:
             return None
         
@@ -95,6 +388,10 @@ class GitHubAuthManager:
         # Fall back to global default repo
         return user_data.get("github_repo")
     
+    def _invalidate_repo_cache(self, slack_user_id: str):
+        """Forget cached repo lookups for a user; caller holds the lock"""
+        self._repo_cache = {k: v for k, v in self._repo_cache.items() if k[0] != slack_user_id}
+    
     def generate_auth_url(self, slack_user_id: str) -> str:
         """
         Generate GitHub OAuth URL for a user to authenticate
@@ -107,7 +404,9 @@ class GitHubAuthManager:
         """
         # Generate random state for CSRF protection
         state = secrets.token_urlsafe(32)
-        self.oauth_states[state] = slack_user_id
+        with self._lock:
+            self._prune_oauth_states()
+            self.oauth_states[state] = (slack_user_id, time.monotonic())
         
         # GitHub OAuth scopes needed
         scopes = "repo,user:email"
@@ -124,6 +423,16 @@ class GitHubAuthManager:
         logger.info(f"Generated OAuth URL for user {slack_user_id} with state {state[:8]}... (total states: {len(self.oauth_states)})")
         return oauth_url
     
+    def _prune_oauth_states(self):
+        """Drop expired states (and the oldest ones beyond the cap); caller holds the lock"""
+        cutoff = time.monotonic() - _OAUTH_STATE_TTL_SECONDS
+        # Dicts keep insertion order, so expired states are always at the front
+        while self.oauth_states:
+            state, (_, created_at) = next(iter(self.oauth_states.items()))
+            if created_at > cutoff and len(self.oauth_states) < _MAX_OAUTH_STATES:
+                break
+            del self.oauth_states[state]
+    
     def get_auth_instructions_message(self, slack_user_id: str) -> Dict:
         """
         Get a formatted Slack message with authentication instructions
@@ -145,30 +454,7 @@ class GitHubAuthManager:
                         "text": f"👋 Hi <@{slack_user_id}>! To use the bot, you need to connect your GitHub account."
                     }
                 },
-                {
-                    "type": "divider"
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": "*🔐 Why do I need to authenticate?*\n\n"
-                                "• The bot creates PRs on *your behalf* in *your repositories*\n"
-                                "• Your code stays private and secure\n"
-                                "• Each team member has their own permissions"
-                    }
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": "*✨ What you'll be able to do:*\n\n"
-                                "• 🤖 Generate code with AI\n"
-                                "• 📝 Create pull requests\n"
-                                "• 🔀 Merge and revert PRs\n"
-                                "• 📊 View your activity dashboard"
-                    }
-                },
+                *_AUTH_INFO_BLOCKS,
                 {
                     "type": "actions",
                     "elements": [
@@ -184,15 +470,7 @@ class GitHubAuthManager:
                         }
                     ]
                 },
-                {
-                    "type": "context",
-                    "elements": [
-                        {
-                            "type": "mrkdwn",
-                            "text": "_After authenticating, come back here and mention me again!_"
-                        }
-                    ]
-                }
+                _AUTH_FOOTER_BLOCK
             ]
         }
     
@@ -210,21 +488,22 @@ class GitHubAuthManager:
         try:
             logger.info(f"Verifying state {state[:8]}... (have {len(self.oauth_states)} states)")
             
-            # Verify state
-            if state not in self.oauth_states:
-                logger.error(f"State not found! Available states: {list(self.oauth_states.keys())[:3]}")
+            # Verify state (single use, and only within its TTL)
+            with self._lock:
+                entry = self.oauth_states.pop(state, None)
+            if entry is None or entry[1] <= time.monotonic() - _OAUTH_STATE_TTL_SECONDS:
+                logger.error(f"State not found or expired! Available states: {list(self.oauth_states.keys())[:3]}")
                 return {
                     "success": False,
                     "error": "Invalid state parameter"
                 }
             
-            slack_user_id = self.oauth_states.pop(state)
+            slack_user_id = entry[0]
             logger.info(f"State verified! User: {slack_user_id}")
             
-            # Exchange code for access token
-            import requests
-            
-            token_response = requests.post(
+            # Exchange code for access token (blocking I/O runs off the event loop)
+            token_response = await asyncio.to_thread(
+                _GH_SESSION.post,
                 "https://github.com/login/oauth/access_token",
                 headers={"Accept": "application/json"},
                 data={
@@ -232,7 +511,8 @@ class GitHubAuthManager:
                     "client_secret": self.github_client_secret,
                     "code": code,
                     "redirect_uri": self.oauth_callback_url
-                }
+                },
+                timeout=_GITHUB_HTTP_TIMEOUT_SECONDS
             )
             
             token_data = token_response.json()
@@ -246,27 +526,32 @@ class GitHubAuthManager:
             access_token = token_data["access_token"]
             
             # Get user info from GitHub
-            user_response = requests.get(
+            user_response = await asyncio.to_thread(
+                _GH_SESSION.get,
                 "https://api.github.com/user",
                 headers={
                     "Authorization": f"Bearer {access_token}",
                     "Accept": "application/vnd.github+json"
-                }
+                },
+                timeout=_GITHUB_HTTP_TIMEOUT_SECONDS
             )
             
             user_data = user_response.json()
             github_username = user_data.get("login")
             
             # Store user token
-            self.user_tokens[slack_user_id] = {
-                "github_token": access_token,
-                "github_username": github_username,
-                "github_repo": None,  # Global default repo (optional)
-                "channel_repos": {},  # Per-channel repos: {channel_id: repo}
-                "authenticated_at": datetime.now().isoformat()
-            }
-            
-            self._save_user_tokens()
+            with self._lock:
+                self.user_tokens[slack_user_id] = {
+                    "github_token": access_token,
+                    "github_username": github_username,
+                    "github_repo": None,  # Global default repo (optional)
+                    "channel_repos": {},  # Per-channel repos: {channel_id: repo}
+                    "authenticated_at": int(time.time()),
+                    # Set only for expiring tokens (GitHub App user tokens)
+                    **self._token_expiry_fields(token_data)
+                }
+                self._invalidate_repo_cache(slack_user_id)
+                self._save_user(slack_user_id)
             
             logger.info(f"User {slack_user_id} authenticated as GitHub user {github_username}")
             
@@ -299,8 +584,6 @@ class GitHubAuthManager:
                 - permissions: dict with user permissions (if success)
         """
         try:
-            from github import Github, GithubException
-            
             # Get user's token
             token = self.get_user_token(slack_user_id)
             if not token:
@@ -309,83 +592,85 @@ class GitHubAuthManager:
                     "error": "You need to connect your GitHub account first. Use `connect github` to get started."
                 }
             
-            # Try to access the repository
-            g = Github(token)
+            # One GET returns the repo and the caller's permissions
+            response = self._get_repo_response(repo, token)
+            if response.status_code == 401:
+                # An expired token gets one refresh-and-retry before reporting 401
+                token = self._refresh_user_token(slack_user_id, token)
+                if token:
+                    response = self._get_repo_response(repo, token)
             
-            try:
-                github_repo = g.get_repo(repo)
-                
-                # Get permissions
-                permissions = {
-                    "admin": github_repo.permissions.admin if github_repo.permissions else False,
-                    "push": github_repo.permissions.push if github_repo.permissions else False,
-                    "pull": github_repo.permissions.pull if github_repo.permissions else False,
+            if response.status_code == 404:
+                return {
+                    "success": False,
+                    "error": f"Repository `{repo}` not found.\n\n"
+                            f"Please check:\n"
+                            f"• The repository name is correct (format: `owner/repository`)\n"
+                            f"• The repository exists\n"
+                            f"• You have access to it (if it's private)"
                 }
-                
-                # Check if user has at least push (write) access
-                if not permissions.get("push"):
-                    return {
-                        "success": False,
-                        "error": f"You don't have write access to `{repo}`. You need push/write permissions to create PRs.\n\n"
-                                f"Your permissions: {'Read only' if permissions.get('pull') else 'No access'}\n\n"
-                                f"Ask the repository owner to add you as a collaborator with write access."
-                    }
-                
-                # Success - user has write access
-                repo_info = {
-                    "full_name": github_repo.full_name,
-                    "name": github_repo.name,
-                    "owner": github_repo.owner.login,
-                    "private": github_repo.private,
-                    "default_branch": github_repo.default_branch,
-                    "url": github_repo.html_url,
-                    "description": github_repo.description or "No description",
+            elif response.status_code == 401:
+                return {
+                    "success": False,
+                    "error": "Your GitHub token has expired or is invalid. Please reconnect with `connect github`."
                 }
-                
-                logger.info(f"User {slack_user_id} validated access to {repo}: permissions={permissions}")
-                
+            elif response.status_code == 403:
                 return {
-                    "success": True,
-                    "repo_info": repo_info,
-                    "permissions": permissions
+                    "success": False,
+                    "error": f"Access forbidden to `{repo}`. This could be due to:\n"
+                            f"• Repository access restrictions\n"
+                            f"• Rate limiting\n"
+                            f"• Organization policies\n\n"
+                            f"Try again in a few minutes or contact the repository owner."
                 }
-                
-            except GithubException as e:
-                if e.status == 404:
-                    return {
-                        "success": False,
-                        "error": f"Repository `{repo}` not found.\n\n"
-                                f"Please check:\n"
-                                f"• The repository name is correct (format: `owner/repository`)\n"
-                                f"• The repository exists\n"
-                                f"• You have access to it (if it's private)"
-                    }
-                elif e.status == 401:
-                    return {
-                        "success": False,
-                        "error": "Your GitHub token has expired or is invalid. Please reconnect with `connect github`."
-                    }
-                elif e.status == 403:
-                    return {
-                        "success": False,
-                        "error": f"Access forbidden to `{repo}`. This could be due to:\n"
-                                f"• Repository access restrictions\n"
-                                f"• Rate limiting\n"
-                                f"• Organization policies\n\n"
-                                f"Try again in a few minutes or contact the repository owner."
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": f"GitHub API error: {e.data.get('message', str(e))}"
-                    }
-                    
-        except ImportError:
-            logger.error("PyGithub not installed")
+            elif response.status_code != 200:
+                try:
+                    message = response.json().get("message", response.reason)
+                except ValueError:
+                    message = response.reason
+                return {
+                    "success": False,
+                    "error": f"GitHub API error: {message}"
+                }
+            
+            github_repo = response.json()
+            
+            # Get permissions
+            repo_permissions = github_repo.get("permissions") or {}
+            permissions = {
+                "admin": repo_permissions.get("admin", False),
+                "push": repo_permissions.get("push", False),
+                "pull": repo_permissions.get("pull", False),
+            }
+            
+            # Check if user has at least push (write) access
+            if not permissions.get("push"):
+                return {
+                    "success": False,
+                    "error": f"You don't have write access to `{repo}`. You need push/write permissions to create PRs.\n\n"
+                            f"Your permissions: {'Read only' if permissions.get('pull') else 'No access'}\n\n"
+                            f"Ask the repository owner to add you as a collaborator with write access."
+                }
+            
+            # Success - user has write access
+            repo_info = {
+                "full_name": github_repo["full_name"],
+                "name": github_repo["name"],
+                "owner": github_repo["owner"]["login"],
+                "private": github_repo["private"],
+                "default_branch": github_repo["default_branch"],
+                "url": github_repo["html_url"],
+                "description": github_repo.get("description") or "No description",
+            }
+            
+            logger.info(f"User {slack_user_id} validated access to {repo}: permissions={permissions}")
+            
             return {
-                "success": False,
-                "error": "GitHub library not available. Please contact the bot administrator."
+                "success": True,
+                "repo_info": repo_info,
+                "permissions": permissions
             }
+            
         except Exception as e:
             logger.error(f"Error validating repo access: {e}")
             return {
@@ -393,6 +678,18 @@ class GitHubAuthManager:
                 "error": f"Error checking repository: {str(e)}"
             }
     
+    @staticmethod
+    def _get_repo_response(repo: str, token: str):
+        """GET /repos/{owner}/{repo} with the user's token"""
+        return _GH_SESSION.get(
+            f"https://api.github.com/repos/{repo}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/vnd.github+json"
+            },
+            timeout=5
+        )
+    
     def set_user_repo(self, slack_user_id: str, repo: str, channel_id: Optional[str] = None):
         """
         Set a user's GitHub repository for a specific channel
@@ -403,35 +700,53 @@ class GitHubAuthManager:
             channel_id: Optional channel ID. If provided, sets channel-specific repo.
                        Otherwise sets global default.
         """
-        if slack_user_id in self.user_tokens:
-            # Initialize channel_repos if it doesn't exist (backward compatibility)
-            if "channel_repos" not in self.user_tokens[slack_user_id]:
-                self.user_tokens[slack_user_id]["channel_repos"] = {}
-            
-            if channel_id:
-                # Set channel-specific repo
-                self.user_tokens[slack_user_id]["channel_repos"][channel_id] = repo
-                logger.info(f"Set repo for user {slack_user_id} in channel {channel_id}: {repo}")
-            else:
-                # Set global default repo
-                self.user_tokens[slack_user_id]["github_repo"] = repo
-                logger.info(f"Set global default repo for user {slack_user_id}: {repo}")
-            
-            self._save_user_tokens()
+        user_data = self._get_user(slack_user_id)
+        if user_data is not None:
+            with self._lock:
+                # Initialize channel_repos if it doesn't exist (backward compatibility)
+                if "channel_repos" not in user_data:
+                    user_data["channel_repos"] = {}
+                
+                if channel_id:
+                    # Set channel-specific repo
+                    user_data["channel_repos"][channel_id] = repo
+                    logger.info(f"Set repo for user {slack_user_id} in channel {channel_id}: {repo}")
+                else:
+                    # Set global default repo
+                    user_data["github_repo"] = repo
+                    logger.info(f"Set global default repo for user {slack_user_id}: {repo}")
+                
+                self._invalidate_repo_cache(slack_user_id)
+                self._save_user(slack_user_id)
     
     def disconnect_user(self, slack_user_id: str):
         """Disconnect a user's GitHub account"""
-        if slack_user_id in self.user_tokens:
-            github_username = self.user_tokens[slack_user_id].get("github_username")
-            del self.user_tokens[slack_user_id]
-            self._save_user_tokens()
+        user_data = self._get_user(slack_user_id)
+        if user_data is not None:
+            github_username = user_data.get("github_username")
+            with self._lock:
+                # Tombstone rather than pop: until the flush deletes the file,
+                # _get_user must not load the user back from it
+                self.user_tokens[slack_user_id] = None
+                self._invalidate_repo_cache(slack_user_id)
+                self._save_user(slack_user_id)
             logger.info(f"Disconnected user {slack_user_id} (GitHub: {github_username})")
             return True
         return False
     
+    def get_authenticated_at(self, slack_user_id: str) -> Optional[datetime]:
+        """When the user connected GitHub (stored as epoch seconds; older records hold ISO strings)"""
+        user_data = self._get_user(slack_user_id)
+        authenticated_at = user_data.get("authenticated_at") if user_data else None
+        if authenticated_at is None:
+            return None
+        if isinstance(authenticated_at, str):
+            return datetime.fromisoformat(authenticated_at)
+        return datetime.fromtimestamp(authenticated_at)
+    
     def get_user_info(self, slack_user_id: str) -> Optional[Dict]:
         """Get user's GitHub connection info"""
-        return self.user_tokens.get(slack_user_id)
+        return self._get_user(slack_user_id)
 
 
 # Global auth manager instance
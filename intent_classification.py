@@ -9,10 +9,191 @@ import os
 import logging
 import re
 import json
+import functools
 from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+# Classification results are cached per message; long messages are rarely
+# repeated verbatim, so they skip the cache instead of evicting useful entries
+_CLASSIFY_CACHE_SIZE = 4096
+_CLASSIFY_CACHE_MAX_LEN = 200
+
+# Shared OpenAI client so back-to-back classifications reuse pooled connections
+_OPENAI_CLIENT = None
+# Tight bounds keep a slow API from stalling Slack handlers; on timeout the
+# regex fallback answers instead
+_OPENAI_TIMEOUT_SECONDS = 5.0
+_OPENAI_CONNECT_TIMEOUT_SECONDS = 2.0
+_OPENAI_MAX_RETRIES = 1
+
+_INTENT_SYSTEM_PROMPT = """You classify replies in a coding assistant's pull request thread. Answer with exactly one word:
+- SUBMIT: create the PR now
+- REFINE: change the proposed code first
+
+Examples:
+"make pr" → SUBMIT
+"looks good, submit it" → SUBMIT
+"add tests" → REFINE
+"looks good but add tests" → REFINE
+"make it use TypeScript instead" → REFINE"""
+
+_COMMAND_SYSTEM_PROMPT = """You classify commands sent to a GitHub/Slack coding bot and extract their parameters.
+
+Categories:
+- CREATE_PR: explicitly asks for a pull request for a task ("make pr for auth"). Extract task_description.
+- REFINE: any other request to write or modify code ("add a login page", "make it faster").
+- MERGE_PR: merge an existing PR ("merge #45 using squash"). Extract pr_number (digits only), merge_method (merge/squash/rebase).
+- REVERT_PR: revert or unmerge a PR ("unmerge #45"). Extract pr_number.
+- CREATE_REPO: create a new repository ("new repo my-app"). Extract repo_name, description (if given), private (true only if asked).
+- VIEW_USAGE: usage stats or dashboard ("show my usage").
+- GENERAL: questions or chat that aren't coding tasks ("what can you do?").
+
+Respond with a JSON object: "command" is one of the categories above; set each extracted field that applies and null for the rest.
+
+Examples:
+"create a PR to add login page" → {"command": "CREATE_PR", "task_description": "add login page"}
+"add a login page" → {"command": "REFINE"}
+"merge #45 with squash" → {"command": "MERGE_PR", "pr_number": "45", "merge_method": "squash"}
+"make a private repository named secret-project" → {"command": "CREATE_REPO", "repo_name": "secret-project", "private": true}
+"what can you do?" → {"command": "GENERAL"}"""
+
+# Strict output schema for command classification: every field is present,
+# unused ones are null (and dropped by _parse_command)
+_COMMAND_SCHEMA = {
+    "name": "command",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "command": {
+                "type": "string",
+                "enum": ["CREATE_PR", "MERGE_PR", "REVERT_PR", "CREATE_REPO", "VIEW_USAGE", "REFINE", "GENERAL"]
+            },
+            "task_description": {"type": ["string", "null"]},
+            "pr_number": {"type": ["string", "null"]},
+            "merge_method": {"type": ["string", "null"], "enum": ["merge", "squash", "rebase", None]},
+            "repo_name": {"type": ["string", "null"]},
+            "description": {"type": ["string", "null"]},
+            "private": {"type": ["boolean", "null"]}
+        },
+        "required": ["command", "task_description", "pr_number", "merge_method", "repo_name", "description", "private"],
+        "additionalProperties": False
+    }
+}
+
+# One request answering both questions, for messages that need intent and command
+_COMBINED_SYSTEM_PROMPT = f"""You answer two questions about each message sent to a GitHub/Slack coding bot.
+
+Question 1 (intent) is decided by this classifier:
+{_INTENT_SYSTEM_PROMPT}
+
+Question 2 (command) is decided by this classifier:
+{_COMMAND_SYSTEM_PROMPT}
+
+Ignore the individual output formats above. Respond with ONLY a JSON object:
+{{"intent": "SUBMIT" | "REFINE", "command": {{"command": <category>, <extracted fields>}}}}"""
+
+MENTION_RE = re.compile(r'<@[A-Z0-9]+>')
+
+# Unambiguous "ship it" replies skip the model entirely. Anchored at both
+# ends so "looks good but add tests" still goes to the classifier
+_SUBMIT_FAST_RE = re.compile(
+    r'^\s*(?:(?:make|create|open|submit)\s+(?:the\s+|a\s+)?pr|submit\s+it|go\s+ahead|ship\s+it|lgtm'
+    r'|looks\s+good(?:,?\s+(?:submit|merge|ship)\s+it)?)\s*[.!]*\s*$',
+    re.IGNORECASE,
+)
+# Messages that clearly ask for more changes skip the model too
+_REFINE_FAST_RE = re.compile(
+    r'^\s*(?:add\s+(?:some\s+|more\s+)?tests?\b|use\s+\w+\s+instead\b|make\s+it\s+\w+er\b|change\s+\w+)',
+    re.IGNORECASE,
+)
+# Short, fully explicit commands are classified locally; anything with extra
+# wording is left to the model
+_COMMAND_FAST_RE = re.compile(
+    r'^(?:(?P<merge>merge)|(?P<revert>unmerge|revert))\s+(?:pr|pull\s+request)?\s*#?\s*(?P<pr_number>\d+)'
+    r'(?:\s+(?:using\s+|with\s+|via\s+)?(?P<merge_method>merge|squash|rebase))?\s*[.!]*$'
+    r'|^(?:create|make|open)\s+(?:a\s+)?(?:pull\s+request|pr)\s+(?:for|to)\s+(?P<task_description>.+)$',
+    re.IGNORECASE,
+)
+
+# Regex fallback patterns, compiled once at import
+_SUBMIT_RE = re.compile(r'\b(?:(?:make|create|open|submit)\s+(?:the\s+)?pr|submit\s+it|go\s+ahead|ship\s+it|lgtm)\b')
+
+# One alternation covers every fallback command so the text is scanned once;
+# the group that matched (lastgroup) names the command. Every alternative
+# starts at a word boundary, so positions inside words fail on the first check
+# (and "remerge 5" / "create a project" no longer match)
+_FALLBACK_RE = re.compile(
+    r'(?P<merge>\bmerge\s+(?:pr|pull\s+request|#)?\s*(?P<merge_num>\d+)\b)'
+    r'|(?P<revert>\b(?:unmerge|revert)\s+(?:pr|pull\s+request|#)?\s*(?P<revert_num>\d+)\b)'
+    r'|(?P<create_pr>\b(?:create|make|open)\s+(?:a\s+)?(?:pull\s+request|pr)\b)'
+    r'|(?P<repo>\b(?:create|make|new|spin\s+up|initialize|init)\s+(?:a\s+)?(?:new\s+)?(?:empty\s+)?(?:github\s+)?'
+    r'repo(?:sitory)?\s+(?:called\s+|named\s+)?(?P<repo_name>[a-zA-Z0-9_-]+))'
+    r'|(?P<usage>\b(?:usage|stats|statistics|dashboard|activity)\b)',
+    re.IGNORECASE,
+)
+# When several commands appear in one message, the earlier entry wins
+_FALLBACK_PRIORITY = ("merge", "revert", "create_pr", "repo", "usage")
+# Every _FALLBACK_RE alternative contains one of these, so text without any
+# of them is GENERAL without running the regex
+_FALLBACK_KEYWORDS = ("merge", "revert", "pr", "pull", "repo", "usage", "stats", "statistics", "dashboard", "activity")
+_SQUASH_RE = re.compile(r'\bsquash\b', re.IGNORECASE)
+_REBASE_RE = re.compile(r'\brebase\b', re.IGNORECASE)
+_TASK_TARGET_RE = re.compile(r'(?:for|to)\s+(.+)', re.IGNORECASE)
+_PRIVATE_RE = re.compile(r'\bprivate\b', re.IGNORECASE)
+
+
+def _collapse_whitespace(text: str) -> str:
+    """Strip and collapse runs of whitespace so trivially different messages share a cache entry"""
+    return " ".join(text.split())
+
+
+def clear_classification_cache():
+    """Drop all cached classifications (e.g. after changing the prompts or model)"""
+    _classify_user_intent_ai.cache_clear()
+    _classify_command_ai.cache_clear()
+    _classify_everything_ai.cache_clear()
+
+
+def _get_client():
+    """Return the module's OpenAI client, creating it on first use"""
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        import httpx
+        import openai
+        _OPENAI_CLIENT = openai.OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            timeout=httpx.Timeout(_OPENAI_TIMEOUT_SECONDS, connect=_OPENAI_CONNECT_TIMEOUT_SECONDS),
+            max_retries=_OPENAI_MAX_RETRIES
+        )
+    return _OPENAI_CLIENT
+
+
+def _classify_intent_locally(message_text: str) -> Optional[str]:
+    """Return the intent for unambiguous messages, or None if the model is needed"""
+    if _SUBMIT_FAST_RE.search(message_text):
+        return "SUBMIT"
+    if _REFINE_FAST_RE.search(message_text):
+        return "REFINE"
+    return None
+
+
+def _classify_command_locally(clean_text: str) -> Optional[Dict]:
+    """Return the command for short explicit merge/revert/create-PR messages, or None if the model is needed"""
+    match = _COMMAND_FAST_RE.match(clean_text)
+    if not match:
+        return None
+    if match.group("merge"):
+        return {
+            "command": "MERGE_PR",
+            "pr_number": match.group("pr_number"),
+            "merge_method": (match.group("merge_method") or "merge").lower()
+        }
+    if match.group("revert"):
+        return {"command": "REVERT_PR", "pr_number": match.group("pr_number")}
+    return {"command": "CREATE_PR", "task_description": match.group("task_description").strip()}
+
 
 def classify_user_intent(message_text: str) -> str:
     """
@@ -24,48 +205,19 @@ def classify_user_intent(message_text: str) -> str:
     Returns:
         str: "SUBMIT" if user wants to create PR, "REFINE" if they want to iterate
     """
-    try:
-        import openai
-        
-        # Use a small, fast model for intent classification
-        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Fast and cheap for classification
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an intent classifier for a coding assistant bot.
-
-Your task: Determine if the user wants to SUBMIT/CREATE a Pull Request NOW, or if they want to REFINE/ITERATE on the proposed code changes.
-
-Respond with EXACTLY one word:
-- "SUBMIT" if they want to create the PR now (e.g., "make pr", "create pr", "submit it", "go ahead", "looks good let's merge")
-- "REFINE" if they want to change/improve the code (e.g., "add tests", "do it in one file", "make it faster", "can you change X")
-
-Examples:
-User: "make pr" → SUBMIT
-User: "create the pr" → SUBMIT
-User: "looks good, submit it" → SUBMIT
-User: "go ahead" → SUBMIT
-User: "Can you do it all in one file?" → REFINE
-User: "Add error handling" → REFINE
-User: "looks good but add tests" → REFINE
-User: "make it use TypeScript instead" → REFINE"""
-                },
-                {
-                    "role": "user",
-                    "content": f"User message: \"{message_text}\"\n\nIntent:"
-                }
-            ],
-            temperature=0,
-            max_tokens=5
-        )
-        
-        intent = response.choices[0].message.content.strip().upper()
-        logger.info(f"🤖 Intent classification: '{message_text}' → {intent}")
-        
+    # The anchored fast-path patterns need the bot mention gone
+    clean_text = _collapse_whitespace(MENTION_RE.sub('', message_text))
+    intent = _classify_intent_locally(clean_text)
+    if intent:
+        logger.info(f"⚡ Intent fast path: '{clean_text}' → {intent}")
         return intent
+    
+    try:
+        # Intent is a single word, so case can be folded into the cache key too
+        normalized = clean_text.lower()
+        if len(normalized) > _CLASSIFY_CACHE_MAX_LEN:
+            return _classify_user_intent_ai.__wrapped__(normalized)
+        return _classify_user_intent_ai(normalized)
         
     except Exception as e:
         logger.error(f"Error in AI intent classification: {e}")
@@ -73,6 +225,65 @@ User: "make it use TypeScript instead" → REFINE"""
         return classify_with_regex_fallback(message_text)
 
 
+@functools.lru_cache(maxsize=_CLASSIFY_CACHE_SIZE)
+def _classify_user_intent_ai(message_text: str) -> str:
+    """Classify intent with the model; raises on API errors so failures are never cached"""
+    response = _get_client().chat.completions.create(**_intent_request(message_text))
+    
+    intent = _parse_intent(response.choices[0].message.content)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"🤖 Intent classification: '{message_text}' → {intent}")
+    
+    return intent
+
+
+@functools.lru_cache(maxsize=None)
+def _intent_logit_bias() -> Optional[Dict]:
+    """
+    logit_bias that restricts the answer to the first token of SUBMIT or REFINE
+    
+    Needs tiktoken to look up the token ids; returns None (no bias) without it.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception as e:
+        logger.info(f"Intent logit bias disabled: {e}")
+        return None
+    return {str(encoding.encode(word)[0]): 100 for word in ("SUBMIT", "REFINE")}
+
+
+def _parse_intent(content: str) -> str:
+    """Map the model's answer to SUBMIT / REFINE (the first letter is enough)"""
+    return "SUBMIT" if content.strip().upper().startswith("S") else "REFINE"
+
+
+def _intent_request(message_text: str) -> Dict:
+    """Build the chat completion arguments for intent classification"""
+    logit_bias = _intent_logit_bias()
+    if logit_bias:
+        # One forced token decides the answer
+        output_limits = {"logit_bias": logit_bias, "max_tokens": 1}
+    else:
+        # SUBMIT / REFINE are at most two tokens each
+        output_limits = {"max_tokens": 3}
+    return {
+        "model": "gpt-4o-mini",  # Fast and cheap for classification
+        "messages": [
+            {
+                "role": "system",
+                "content": _INTENT_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"User message: \"{message_text}\"\n\nIntent:"
+            }
+        ],
+        "temperature": 0,
+        **output_limits
+    }
+
+
 def classify_with_regex_fallback(message_text: str) -> str:
     """
     Fallback to regex patterns if AI classification fails
@@ -83,18 +294,11 @@ def classify_with_regex_fallback(message_text: str) -> str:
     Returns:
         str: "SUBMIT" or "REFINE"
     """
-    create_pr_patterns = [
-        r'\bmake\s+(?:the\s+)?pr\b',
-        r'\bcreate\s+(?:the\s+)?pr\b',
-        r'\bopen\s+(?:the\s+)?pr\b',
-        r'\bsubmit\s+(?:the\s+)?pr\b',
-    ]
-    
     text_lower = message_text.lower().strip()
-    for pattern in create_pr_patterns:
-        if re.search(pattern, text_lower):
-            logger.info(f"🔁 Fallback regex matched: {pattern}")
-            return "SUBMIT"
+    match = _SUBMIT_RE.search(text_lower)
+    if match:
+        logger.info(f"🔁 Fallback regex matched: {match.group(0)}")
+        return "SUBMIT"
     
     return "REFINE"
 
@@ -133,94 +337,22 @@ def classify_command(message_text: str) -> Dict:
         }
     """
     try:
-        import openai
-        
-        # Clean text (remove bot mentions)
-        clean_text = re.sub(r'<@[A-Z0-9]+>', '', message_text).strip()
-        
-        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a command classifier for a GitHub/Slack bot.
-
-Classify user commands into these categories and extract parameters:
-
-1. CREATE_PR - User explicitly asks to create a pull request with specific task
-   Examples: "create a PR to add login", "make pr for auth feature"
-   Extract: task_description
-
-2. REFINE - User describes a coding task without explicitly saying "PR" (treated same as CREATE_PR)
-   Examples: "add a login page", "create authentication", "add tests", "make it faster"
-   This is for any request to write/modify code
-   No extraction needed (the whole message is the task)
-
-3. MERGE_PR - User wants to merge an existing PR
-   Examples: "merge PR 123", "merge #45 using squash", "merge 12"
-   Extract: pr_number (just the number), merge_method ("merge", "squash", or "rebase")
-
-4. REVERT_PR - User wants to revert/undo a merged PR
-   Examples: "revert PR 123", "unmerge #45", "revert 12"
-   Extract: pr_number (just the number)
-
-5. CREATE_REPO - User wants to create a new GitHub repository
-   Examples: "create a new repo called my-app", "make a repository named test-project", "new repo my-project", "create empty repo foo-bar", "spin up a new repository", "initialize a repo called demo"
-   Extract: repo_name (the name of the repository to create), description (optional description), private (boolean, true if user says private)
-   
-6. VIEW_USAGE - User wants to view their usage statistics or dashboard
-   Examples: "show my usage", "view stats", "dashboard", "my activity", "usage report"
-   No parameters needed
-
-7. GENERAL - General question or conversation (NOT a coding task)
-   Examples: "what can you do?", "help", "hello", "how are you"
-   No parameters needed
-
-Respond with ONLY valid JSON in this format:
-{
-    "command": "CREATE_PR" | "MERGE_PR" | "REVERT_PR" | "CREATE_REPO" | "VIEW_USAGE" | "REFINE" | "GENERAL",
-    "task_description": "extracted description" (only for CREATE_PR),
-    "pr_number": "123" (only for MERGE_PR or REVERT_PR, number as string),
-    "merge_method": "merge" | "squash" | "rebase" (only for MERGE_PR, default "merge"),
-    "repo_name": "my-repo-name" (only for CREATE_REPO),
-    "description": "optional description" (only for CREATE_REPO, optional),
-    "private": true | false (only for CREATE_REPO, default false)
-}
-
-Examples:
-"create a PR to add login page" → {"command": "CREATE_PR", "task_description": "add login page"}
-"add a login page" → {"command": "REFINE"}
-"create authentication system" → {"command": "REFINE"}
-"add error handling" → {"command": "REFINE"}
-"merge PR 123" → {"command": "MERGE_PR", "pr_number": "123", "merge_method": "merge"}
-"merge #45 with squash" → {"command": "MERGE_PR", "pr_number": "45", "merge_method": "squash"}
-"revert PR 12" → {"command": "REVERT_PR", "pr_number": "12"}
-"create a new repo called my-app" → {"command": "CREATE_REPO", "repo_name": "my-app", "private": false}
-"make a private repository named secret-project" → {"command": "CREATE_REPO", "repo_name": "secret-project", "private": true}
-"new repo test-project for testing stuff" → {"command": "CREATE_REPO", "repo_name": "test-project", "description": "for testing stuff", "private": false}
-"show my usage" → {"command": "VIEW_USAGE"}
-"dashboard" → {"command": "VIEW_USAGE"}
-"what can you do?" → {"command": "GENERAL"}
-"hello" → {"command": "GENERAL"}"""
-                },
-                {
-                    "role": "user",
-                    "content": f"User message: \"{clean_text}\"\n\nClassify and extract:"
-                }
-            ],
-            temperature=0,
-            max_tokens=100
-        )
+        # Clean text (remove bot mentions). Case is kept in the cache key:
+        # extracted task descriptions and repo names echo the user's text
+        clean_text = _collapse_whitespace(MENTION_RE.sub('', message_text))
         
-        result_text = response.choices[0].message.content.strip()
+        command = _classify_command_locally(clean_text)
+        if command:
+            logger.info(f"⚡ Command fast path: '{clean_text}' → {command}")
+            return command
         
-        # Parse JSON response
-        result = json.loads(result_text)
-        logger.info(f"🤖 Command classification: '{clean_text}' → {result}")
+        if len(clean_text) > _CLASSIFY_CACHE_MAX_LEN:
+            result_text = _classify_command_ai.__wrapped__(clean_text)
+        else:
+            result_text = _classify_command_ai(clean_text)
         
-        return result
+        # Cached as a JSON string; parse per call so callers get their own dict
+        return json.loads(result_text)
         
     except Exception as e:
         logger.error(f"Error in AI command classification: {e}")
@@ -228,6 +360,121 @@ Examples:
         return classify_command_with_regex(message_text)
 
 
+@functools.lru_cache(maxsize=_CLASSIFY_CACHE_SIZE)
+def _classify_command_ai(clean_text: str) -> str:
+    """Classify a command with the model, returning the raw JSON text; raises on API or parse errors"""
+    response = _get_client().chat.completions.create(**_command_request(clean_text))
+    
+    # Parse here so a malformed response raises (and isn't cached)
+    result = _parse_command(response.choices[0].message.content)
+    logger.info(f"🤖 Command classification: '{clean_text}' → {result}")
+    
+    return json.dumps(result)
+
+
+def _command_request(clean_text: str) -> Dict:
+    """Build the chat completion arguments for command classification"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": _COMMAND_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"User message: \"{clean_text}\"\n\nClassify and extract:"
+            }
+        ],
+        "response_format": {"type": "json_schema", "json_schema": _COMMAND_SCHEMA},
+        "temperature": 0,
+        # Headroom for the null fields the strict schema always emits
+        "max_tokens": 100
+    }
+
+
+def _parse_command(result) -> Dict:
+    """
+    Normalize a command classification (JSON text, or an already decoded dict),
+    dropping the null fields so callers' .get() defaults apply
+    """
+    if isinstance(result, str):
+        result = json.loads(result)
+    return {k: v for k, v in result.items() if v is not None}
+
+
+def classify_everything(message_text: str) -> Dict:
+    """
+    Classify intent and command for the same message with a single model call
+    
+    Args:
+        message_text: User's message
+        
+    Returns:
+        dict: {"intent": "SUBMIT" | "REFINE", "command": <classify_command result>}
+    """
+    clean_text = _collapse_whitespace(MENTION_RE.sub('', message_text))
+    
+    # Either fast path settles the message without the model. Replies the intent
+    # patterns recognise ("make pr", "lgtm", "add tests") are about the PR in this
+    # thread, so they continue it as REFINE; explicit commands take the regex intent
+    intent = _classify_intent_locally(clean_text)
+    command = _classify_command_locally(clean_text)
+    if intent or command:
+        result = {
+            "intent": intent or classify_with_regex_fallback(clean_text),
+            "command": command or {"command": "REFINE"}
+        }
+        logger.info(f"⚡ Combined fast path: '{clean_text}' → {result}")
+        return result
+    
+    try:
+        if len(clean_text) > _CLASSIFY_CACHE_MAX_LEN:
+            result_text = _classify_everything_ai.__wrapped__(clean_text)
+        else:
+            result_text = _classify_everything_ai(clean_text)
+        
+        return json.loads(result_text)
+        
+    except Exception as e:
+        logger.error(f"Error in AI combined classification: {e}")
+        return {
+            "intent": classify_with_regex_fallback(message_text),
+            "command": classify_command_with_regex(message_text)
+        }
+
+
+@functools.lru_cache(maxsize=_CLASSIFY_CACHE_SIZE)
+def _classify_everything_ai(clean_text: str) -> str:
+    """Classify intent and command with one model call, returning normalized JSON text; raises on API or parse errors"""
+    response = _get_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": _COMBINED_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"User message: \"{clean_text}\"\n\nClassify:"
+            }
+        ],
+        response_format={"type": "json_object"},
+        temperature=0,
+        max_tokens=120
+    )
+    
+    result = json.loads(response.choices[0].message.content)
+    # Raise on a malformed shape so it isn't cached and the fallback kicks in
+    if not isinstance(result.get("command"), dict) or "command" not in result["command"]:
+        raise ValueError(f"Unexpected combined classification: {result}")
+    result["intent"] = _parse_intent(str(result.get("intent", "")))
+    result["command"] = _parse_command(result["command"])
+    logger.info(f"🤖 Combined classification: '{clean_text}' → {result}")
+    
+    return json.dumps(result)
+
+
 def classify_command_with_regex(message_text: str) -> Dict:
     """
     Fallback regex-based command classification
@@ -238,93 +485,71 @@ def classify_command_with_regex(message_text: str) -> Dict:
     Returns:
         dict with command type and parameters
     """
-    clean_text = re.sub(r'<@[A-Z0-9]+>', '', message_text).strip()
+    clean_text = MENTION_RE.sub('', message_text).strip()
     
-    # Check for MERGE_PR
-    merge_patterns = [
-        r'merge\s+(?:pr|pull\s+request|#)?\s*(\d+)',
-    ]
-    for pattern in merge_patterns:
-        match = re.search(pattern, clean_text, re.IGNORECASE)
-        if match:
-            pr_number = match.group(1)
-            merge_method = "merge"
-            if re.search(r'\bsquash\b', clean_text, re.IGNORECASE):
-                merge_method = "squash"
-            elif re.search(r'\brebase\b', clean_text, re.IGNORECASE):
-                merge_method = "rebase"
-            logger.info(f"🔁 Fallback: MERGE_PR detected - PR #{pr_number}")
-            return {
-                "command": "MERGE_PR",
-                "pr_number": pr_number,
-                "merge_method": merge_method
-            }
+    # Cheap substring checks rule out most non-command messages before the regex scan
+    lowered = clean_text.lower()
+    if not any(keyword in lowered for keyword in _FALLBACK_KEYWORDS):
+        logger.info(f"🔁 Fallback: GENERAL command")
+        return {"command": "GENERAL"}
     
-    # Check for REVERT_PR
-    revert_patterns = [
-        r'(?:unmerge|revert)\s+(?:pr|pull\s+request|#)?\s*(\d+)',
-    ]
-    for pattern in revert_patterns:
-        match = re.search(pattern, clean_text, re.IGNORECASE)
-        if match:
-            pr_number = match.group(1)
-            logger.info(f"🔁 Fallback: REVERT_PR detected - PR #{pr_number}")
-            return {
-                "command": "REVERT_PR",
-                "pr_number": pr_number
-            }
+    # Single pass: keep the first match of each command kind
+    matches = {}
+    for match in _FALLBACK_RE.finditer(clean_text):
+        # The outer named group closes last, so lastgroup is the command kind
+        matches.setdefault(match.lastgroup, match)
+        if "merge" in matches:
+            break
     
-    # Check for CREATE_PR
-    pr_keywords = [
-        r'create\s+(?:a\s+)?(?:pull\s+request|pr)',
-        r'make\s+(?:a\s+)?(?:pull\s+request|pr)',
-        r'open\s+(?:a\s+)?(?:pull\s+request|pr)',
-    ]
-    for pattern in pr_keywords:
-        match = re.search(pattern, clean_text, re.IGNORECASE)
-        if match:
-            task_description = clean_text[match.end():].strip()
-            for_match = re.search(r'(?:for|to)\s+(.+)', task_description, re.IGNORECASE)
-            if for_match:
-                task_description = for_match.group(1).strip()
-            logger.info(f"🔁 Fallback: CREATE_PR detected")
-            return {
-                "command": "CREATE_PR",
-                "task_description": task_description or "No specific task description provided"
-            }
+    kind = next((k for k in _FALLBACK_PRIORITY if k in matches), None)
+    match = matches.get(kind)
     
-    # Check for CREATE_REPO
-    repo_patterns = [
-        r'(?:create|make|new|spin\s+up|initialize|init)\s+(?:a\s+)?(?:new\s+)?(?:empty\s+)?(?:repo(?:sitory)?)\s+(?:called\s+|named\s+)?([a-zA-Z0-9_-]+)',
-        r'(?:new|create)\s+(?:a\s+)?(?:github\s+)?repo(?:sitory)?\s+([a-zA-Z0-9_-]+)',
-    ]
-    for pattern in repo_patterns:
-        match = re.search(pattern, clean_text, re.IGNORECASE)
-        if match:
-            repo_name = match.group(1)
-            is_private = bool(re.search(r'\bprivate\b', clean_text, re.IGNORECASE))
-            logger.info(f"🔁 Fallback: CREATE_REPO detected - {repo_name}")
-            return {
-                "command": "CREATE_REPO",
-                "repo_name": repo_name,
-                "private": is_private
-            }
+    if kind == "merge":
+        pr_number = match.group("merge_num")
+        merge_method = "merge"
+        if _SQUASH_RE.search(clean_text):
+            merge_method = "squash"
+        elif _REBASE_RE.search(clean_text):
+            merge_method = "rebase"
+        logger.info(f"🔁 Fallback: MERGE_PR detected - PR #{pr_number}")
+        return {
+            "command": "MERGE_PR",
+            "pr_number": pr_number,
+            "merge_method": merge_method
+        }
+    
+    if kind == "revert":
+        pr_number = match.group("revert_num")
+        logger.info(f"🔁 Fallback: REVERT_PR detected - PR #{pr_number}")
+        return {
+            "command": "REVERT_PR",
+            "pr_number": pr_number
+        }
+    
+    if kind == "create_pr":
+        task_description = clean_text[match.end():].strip()
+        for_match = _TASK_TARGET_RE.search(task_description)
+        if for_match:
+            task_description = for_match.group(1).strip()
+        logger.info(f"🔁 Fallback: CREATE_PR detected")
+        return {
+            "command": "CREATE_PR",
+            "task_description": task_description or "No specific task description provided"
+        }
+    
+    if kind == "repo":
+        repo_name = match.group("repo_name")
+        is_private = bool(_PRIVATE_RE.search(clean_text))
+        logger.info(f"🔁 Fallback: CREATE_REPO detected - {repo_name}")
+        return {
+            "command": "CREATE_REPO",
+            "repo_name": repo_name,
+            "private": is_private
+        }
     
-    # Check for VIEW_USAGE
-    usage_keywords = [
-        r'\busage\b',
-        r'\bstats\b',
-        r'\bstatistics\b',
-        r'\bdashboard\b',
-        r'\bactivity\b',
-        r'\bmy\s+usage\b',
-        r'\bshow\s+usage\b',
-        r'\bview\s+stats\b',
-    ]
-    for pattern in usage_keywords:
-        if re.search(pattern, clean_text, re.IGNORECASE):
-            logger.info(f"🔁 Fallback: VIEW_USAGE detected")
-            return {"command": "VIEW_USAGE"}
+    if kind == "usage":
+        logger.info(f"🔁 Fallback: VIEW_USAGE detected")
+        return {"command": "VIEW_USAGE"}
     
     # Default to GENERAL
     logger.info(f"🔁 Fallback: GENERAL command")
@@ -5,55 +5,43 @@ Simple Flask server to handle GitHub OAuth callbacks
 Run alongside the Slack bot to handle authentication
 """
 
+import asyncio
 import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 
 # Load environment variables FIRST
 load_dotenv()
 
-from flask import Flask, request, redirect
+from flask import Flask, Response, request, redirect
+from markupsafe import escape
 from github_oauth import auth_manager
 
 app = Flask(__name__)
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One long-lived event loop for OAuth callbacks instead of asyncio.run() per request.
+# handle_oauth_callback pushes its GitHub requests to worker threads, so concurrent
+# callbacks don't queue behind each other on this loop.
+_CALLBACK_TIMEOUT_SECONDS = 30
+_LOOP = asyncio.new_event_loop()
+threading.Thread(target=_LOOP.run_forever, name="oauth-callback-loop", daemon=True).start()
 
-@app.route('/auth/github/callback')
-def github_callback():
-    """Handle GitHub OAuth callback"""
-    code = request.args.get('code')
-    state = request.args.get('state')
-    
-    if not code or not state:
-        return """
-        <html>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>❌ Authentication Failed</h1>
-                <p>Missing code or state parameter</p>
-                <p><a href="/">Try again</a></p>
-            </body>
-        </html>
-        """, 400
-    
-    # Handle the OAuth callback (synchronous call)
-    import asyncio
-    result = asyncio.run(auth_manager.handle_oauth_callback(code, state))
-    
-    if result["success"]:
-        github_username = result["github_username"]
-        return f"""
+
+# Response pages, encoded once; only the escaped username / error is spliced in per request
+_SUCCESS_PREFIX = """
         <html>
             <head>
                 <style>
-                    body {{
+                    body {
                         font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
                         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
                         padding: 40px;
                         text-align: center;
                         color: white;
-                    }}
-                    .container {{
+                    }
+                    .container {
                         background: white;
                         color: #333;
                         padding: 40px;
@@ -61,31 +49,32 @@ def github_callback():
                         max-width: 500px;
                         margin: 0 auto;
                         box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-                    }}
-                    h1 {{ color: #4CAF50; margin-bottom: 10px; }}
-                    .username {{ 
+                    }
+                    h1 { color: #4CAF50; margin-bottom: 10px; }
+                    .username { 
                         background: #f0f0f0;
                         padding: 10px 20px;
                         border-radius: 20px;
                         display: inline-block;
                         margin: 20px 0;
                         font-weight: bold;
-                    }}
-                    .next-steps {{
+                    }
+                    .next-steps {
                         text-align: left;
                         background: #f9f9f9;
                         padding: 20px;
                         border-radius: 8px;
                         margin-top: 20px;
-                    }}
-                    .next-steps li {{ margin: 10px 0; }}
+                    }
+                    .next-steps li { margin: 10px 0; }
                 </style>
             </head>
             <body>
                 <div class="container">
                     <h1>✅ Successfully Connected!</h1>
                     <p>Your GitHub account has been linked to the Slack bot.</p>
-                    <div class="username">🐙 {github_username}</div>
+                    <div class="username">🐙 """.encode()
+_SUCCESS_SUFFIX = """</div>
                     
                     <div class="next-steps">
                         <h3>📋 Next Steps:</h3>
@@ -102,18 +91,58 @@ def github_callback():
                 </div>
             </body>
         </html>
-        """
-    else:
-        error = result.get("error", "Unknown error")
-        return f"""
+""".encode()
+
+_FAILURE_PREFIX = """
         <html>
             <body style="font-family: sans-serif; padding: 40px; text-align: center;">
                 <h1>❌ Authentication Failed</h1>
-                <p>{error}</p>
+                <p>""".encode()
+_FAILURE_SUFFIX = """</p>
                 <p><a href="/">Try again</a></p>
             </body>
         </html>
-        """, 400
+        """.encode()
+_MISSING_PARAMS_PAGE = _FAILURE_PREFIX + b"Missing code or state parameter" + _FAILURE_SUFFIX
+
+
+def _html_response(body: bytes, status: int = 200) -> Response:
+    """Wrap a pre-encoded HTML page in a response"""
+    return Response(body, status=status, mimetype="text/html")
+
+
+def oauth_callback_response(code: str, state: str) -> Response:
+    """
+    Complete a GitHub OAuth callback and render the result page
+    
+    Shared by this server and the Slack bot's own callback route.
+    """
+    if not code or not state:
+        return _html_response(_MISSING_PARAMS_PAGE, 400)
+    
+    # Handle the OAuth callback on the shared loop, bounded by a timeout
+    future = asyncio.run_coroutine_threadsafe(auth_manager.handle_oauth_callback(code, state), _LOOP)
+    try:
+        result = future.result(timeout=_CALLBACK_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        # Stops waiting on the coroutine; a request already in flight still finishes
+        # in its worker thread (bounded by its own HTTP timeout) and may yet store the token
+        future.cancel()
+        logger.error("OAuth callback timed out")
+        result = {"success": False, "error": "Timed out talking to GitHub. Please try again."}
+    
+    if result["success"]:
+        github_username = escape(result["github_username"] or "")
+        return _html_response(_SUCCESS_PREFIX + str(github_username).encode() + _SUCCESS_SUFFIX)
+    else:
+        error = escape(result.get("error", "Unknown error"))
+        return _html_response(_FAILURE_PREFIX + str(error).encode() + _FAILURE_SUFFIX, 400)
+
+
+@app.route('/auth/github/callback')
+def github_callback():
+    """Handle GitHub OAuth callback"""
+    return oauth_callback_response(request.args.get('code'), request.args.get('state'))
 
 
 @app.route('/health')
@@ -123,6 +152,9 @@ def health():
 
 
 if __name__ == '__main__':
+    # Configure logging only when run as the entrypoint, not when imported
+    logging.basicConfig(level=logging.INFO)
+    
     print("=" * 60)
     print("🔐 GitHub OAuth Callback Server")
     print("=" * 60)
@@ -7,7 +7,6 @@ import os
 import logging
 import re
 import time
-import asyncio
 import threading
 import json
 from typing import Optional
@@ -23,8 +22,9 @@ from stats_tracker import log_pr_creation, mark_pr_merged
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from github_helper import GitHubPRHelper
-from intent_classification import is_ready_to_create_pr, classify_command
+from intent_classification import MENTION_RE, is_ready_to_create_pr, classify_command, classify_everything
 from github_oauth import auth_manager
+from oauth_server import oauth_callback_response
 
 # Set up logging
 logging.basicConfig(
@@ -82,6 +82,23 @@ def _save_pr_conversations():
 pr_conversations = _load_pr_conversations()
 
 
+# Management commands that don't need a repo, matched in one scan of the cleaned text.
+# When several appear, the earliest entry in _MANAGEMENT_PRIORITY wins
+_MANAGEMENT_COMMAND_RE = re.compile(
+    r'(?P<set_repo>\bset\s+repo\b)'
+    r'|(?P<status>\b(?:github|connection)\s+status\b)'
+    r'|(?P<disconnect>\bdisconnect\s+github\b)'
+)
+_MANAGEMENT_PRIORITY = ("set_repo", "status", "disconnect")
+_SET_REPO_ARG_RE = re.compile(r'set\s+repo\s+([a-zA-Z0-9_-]+/[a-zA-Z0-9_.-]+)', re.IGNORECASE)
+
+
+def _detect_management_command(clean_text):
+    """Return the highest-priority management command in clean_text, or None"""
+    found = {match.lastgroup for match in _MANAGEMENT_COMMAND_RE.finditer(clean_text)}
+    return next((kind for kind in _MANAGEMENT_PRIORITY if kind in found), None)
+
+
 def _generate_changeset_preview(prompt: str, context: str, github_helper_instance, image_data=None, stream_callback=None) -> dict:
     """
     Generate a changeset preview using direct OpenAI API
@@ -143,13 +160,14 @@ The user can refine these changes through conversation before creating the PR.
         
         # Format the response as a changeset for Slack with GitHub-style diff
         if parsed_files:
-            formatted_response = ""
+            # Collect pieces and join once; previews can run to hundreds of lines
+            parts = []
             
             # Add truncation warning at the top if needed
             if was_truncated:
-                formatted_response += "⚠️ **WARNING**: Response truncated - last file may be incomplete. Consider smaller tasks.\n\n"
+                parts.append("⚠️ **WARNING**: Response truncated - last file may be incomplete. Consider smaller tasks.\n\n")
             
-            formatted_response += "📝 PROPOSED CHANGESET\n━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            parts.append("📝 PROPOSED CHANGESET\n━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n")
             
             for file_info in parsed_files:
                 filepath = file_info.get("path", "unknown")
@@ -162,40 +180,29 @@ The user can refine these changes through conversation before creating the PR.
                 
                 # Format file header with diff stats
                 if action == "DELETED":
-                    formatted_response += f"🔴 `{filepath}` *[DELETED]* `-{line_count}`\n\n"
-                    formatted_response += f"```diff\n"
+                    parts.append(f"🔴 `{filepath}` *[DELETED]* `-{line_count}`\n\n")
                     # Show deleted lines with - prefix (red in diff)
-                    preview_lines = lines[:20] if len(lines) > 20 else lines
-                    for line in preview_lines:
-                        formatted_response += f"- {line}\n"
-                    if len(lines) > 20:
-                        formatted_response += f"... ({len(lines) - 20} more lines)\n"
-                    formatted_response += f"```\n\n"
+                    prefix = "- "
                 elif action == "NEW":
-                    formatted_response += f"🟢 `{filepath}` *[NEW]* `+{line_count}`\n\n"
-                    formatted_response += f"```diff\n"
+                    parts.append(f"🟢 `{filepath}` *[NEW]* `+{line_count}`\n\n")
                     # Show new lines with + prefix (green in diff)
-                    preview_lines = lines[:20] if len(lines) > 20 else lines
-                    for line in preview_lines:
-                        formatted_response += f"+ {line}\n"
-                    if len(lines) > 20:
-                        formatted_response += f"... ({len(lines) - 20} more lines)\n"
-                    formatted_response += f"```\n\n"
+                    prefix = "+ "
                 else:  # MODIFIED
                     # For modified files, we don't have the old content to compare
                     # So we just show the new content with + prefix
-                    formatted_response += f"🟡 `{filepath}` *[MODIFIED]* `~{line_count}`\n\n"
-                    formatted_response += f"```diff\n"
-                    preview_lines = lines[:20] if len(lines) > 20 else lines
-                    for line in preview_lines:
-                        formatted_response += f"+ {line}\n"
-                    if len(lines) > 20:
-                        formatted_response += f"... ({len(lines) - 20} more lines)\n"
-                    formatted_response += f"```\n\n"
+                    parts.append(f"🟡 `{filepath}` *[MODIFIED]* `~{line_count}`\n\n")
+                    prefix = "+ "
                 
-                formatted_response += "━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+                parts.append("```diff\n")
+                parts.extend(f"{prefix}{line}\n" for line in lines[:20])
+                if len(lines) > 20:
+                    parts.append(f"... ({len(lines) - 20} more lines)\n")
+                parts.append("```\n\n")
+                
+                parts.append("━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n")
             
-            formatted_response += f"📊 Summary: {len(parsed_files)} file(s) in this changeset"
+            parts.append(f"📊 Summary: {len(parsed_files)} file(s) in this changeset")
+            formatted_response = "".join(parts)
         else:
             formatted_response = str(raw_response)
         
@@ -332,6 +339,30 @@ if os.environ.get("GITHUB_TOKEN") and os.environ.get("GITHUB_REPO"):
         logger.warning(f"GitHub integration failed to initialize: {e}")
 
 
+# Slack display names, cached per user: {user_id: (username, expires_at)}
+_USER_NAME_CACHE = {}
+_USER_NAME_TTL_SECONDS = 1800
+
+
+def _resolve_username(client, user_id):
+    """
+    Resolve a Slack user's display name via users_info, cached for _USER_NAME_TTL_SECONDS
+    
+    Returns None (uncached) if the lookup fails.
+    """
+    cached = _USER_NAME_CACHE.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    try:
+        user_info = client.users_info(user=user_id)
+        username = user_info["user"]["real_name"] or user_info["user"]["name"]
+    except Exception as e:
+        logger.debug(f"users_info failed for {user_id}: {e}")
+        return None
+    _USER_NAME_CACHE[user_id] = (username, time.monotonic() + _USER_NAME_TTL_SECONDS)
+    return username
+
+
 def get_channel_context(client, channel_id, limit=50):
     """
     Fetch recent messages from the channel to provide context.
@@ -587,13 +618,10 @@ def _get_channel_display_name(client, channel_id):
         if channel.get("is_im"):
             user_id = channel.get("user")
             if user_id:
-                try:
-                    user_info = client.users_info(user=user_id)
-                    user = user_info.get("user", {})
-                    display = user.get("real_name") or user.get("name") or user_id
-                    return f"DM @{display}"
-                except Exception:
-                    return f"DM {user_id}"
+                username = _resolve_username(client, user_id)
+                if username:
+                    return f"DM @{username}"
+                return f"DM {user_id}"
             return "Direct Message"
 
         if channel.get("is_mpim"):
@@ -623,6 +651,7 @@ def handle_pr_conversation(
     is_initial=False,
     image_data=None,
     channel_name=None,
+    intent=None,
 ):
     """
     Handle conversational PR planning - discuss requirements before creating PR
@@ -637,6 +666,7 @@ def handle_pr_conversation(
         is_initial: True if this is the initial "create PR" command
         image_data: Optional dict holding base64 encoded image for vision models
         channel_name: Optional Slack channel name (for analytics/dashboard)
+        intent: Optional pre-computed "SUBMIT"/"REFINE" intent (skips classification)
     """
     logger.info("=" * 80)
     logger.info("💬 HANDLE_PR_CONVERSATION FUNCTION ENTERED")
@@ -728,7 +758,8 @@ def handle_pr_conversation(
     _save_pr_conversations()  # Save after user message
     
     # Check if user wants to create the PR now
-    if is_ready_to_create_pr(message_text) and not is_initial:
+    ready = intent == "SUBMIT" if intent is not None else is_ready_to_create_pr(message_text)
+    if ready and not is_initial:
         say(
             text=f"<@{stored_user_id}> ✅ Perfect! Creating the pull request now...",
             thread_ts=thread_ts
@@ -964,25 +995,29 @@ Rules:
         # Split long messages into chunks (Slack limit: 3000 chars per block)
         def split_message_into_chunks(message: str, max_length: int = 2900) -> list:
             """Split message into chunks that fit Slack's block size limit"""
-            # Leave room for the user tag and formatting
+            # Leave room for the user tag and formatting. Lines are collected per
+            # chunk and joined once, tracking the joined length as we go
             chunks = []
-            current_chunk = ""
+            chunk_lines = []
+            chunk_length = 0
             
             for line in message.split('\n'):
                 # If adding this line would exceed limit, start new chunk
-                if len(current_chunk) + len(line) + 1 > max_length:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    current_chunk = line
+                if chunk_length + len(line) + 1 > max_length:
+                    if chunk_length:
+                        chunks.append('\n'.join(chunk_lines))
+                    chunk_lines = [line]
+                    chunk_length = len(line)
+                elif chunk_length:
+                    chunk_lines.append(line)
+                    chunk_length += len(line) + 1
                 else:
-                    if current_chunk:
-                        current_chunk += '\n' + line
-                    else:
-                        current_chunk = line
+                    chunk_lines = [line]
+                    chunk_length = len(line)
             
             # Add final chunk
-            if current_chunk:
-                chunks.append(current_chunk)
+            if chunk_length:
+                chunks.append('\n'.join(chunk_lines))
             
             return chunks if chunks else [message[:max_length]]
         
@@ -1640,10 +1675,6 @@ def handle_app_mention(event, client, say, logger):
                     thread_ts=thread_ts
                 )
         
-        # Get user info
-        user_info = client.users_info(user=user_id)
-        username = user_info["user"]["real_name"] or user_info["user"]["name"]
-        
         # Check if user has authenticated with GitHub
         if not auth_manager.is_user_authenticated(user_id):
             # User needs to authenticate first
@@ -1655,11 +1686,12 @@ def handle_app_mention(event, client, say, logger):
             return
         
         # Check for GitHub management commands (BEFORE repo check, since these don't need a repo)
-        clean_text = re.sub(r'<@[A-Z0-9]+>', '', message_text).strip().lower()
+        clean_text = MENTION_RE.sub('', message_text).strip().lower()
+        management_command = _detect_management_command(clean_text)
         
         # SET REPO command
-        if re.search(r'\bset\s+repo\b', clean_text):
-            repo_match = re.search(r'set\s+repo\s+([a-zA-Z0-9_-]+/[a-zA-Z0-9_.-]+)', message_text, re.IGNORECASE)
+        if management_command == "set_repo":
+            repo_match = _SET_REPO_ARG_RE.search(message_text)
             if repo_match:
                 repo = repo_match.group(1)
                 
@@ -1710,14 +1742,15 @@ def handle_app_mention(event, client, say, logger):
             return
         
         # GITHUB STATUS command
-        elif re.search(r'\bgithub\s+status\b', clean_text) or re.search(r'\bconnection\s+status\b', clean_text):
+        elif management_command == "status":
             user_info = auth_manager.get_user_info(user_id)
             if user_info:
                 github_username = user_info.get("github_username", "Unknown")
                 github_repo = user_info.get("github_repo", "Not set")
-                auth_date = user_info.get("authenticated_at", "Unknown")
+                authenticated_at = auth_manager.get_authenticated_at(user_id)
+                auth_date = authenticated_at.strftime("%Y-%m-%d") if authenticated_at else "Unknown"
                 say(
-                    text=f"<@{user_id}> 🔗 *GitHub Connection Status*\n\n✅ Connected\n\n🐙 *GitHub User:* `{github_username}`\n📂 *Default Repo:* `{github_repo}`\n📅 *Connected:* {auth_date[:10]}\n\n_To change repo: `set repo owner/repository`_\n_To disconnect: `disconnect github`_",
+                    text=f"<@{user_id}> 🔗 *GitHub Connection Status*\n\n✅ Connected\n\n🐙 *GitHub User:* `{github_username}`\n📂 *Default Repo:* `{github_repo}`\n📅 *Connected:* {auth_date}\n\n_To change repo: `set repo owner/repository`_\n_To disconnect: `disconnect github`_",
                     thread_ts=thread_ts
                 )
             else:
@@ -1728,7 +1761,7 @@ def handle_app_mention(event, client, say, logger):
             return
         
         # DISCONNECT GITHUB command
-        elif re.search(r'\bdisconnect\s+github\b', clean_text):
+        elif management_command == "disconnect":
             if auth_manager.disconnect_user(user_id):
                 say(
                     text=f"<@{user_id}> 👋 Your GitHub account has been disconnected.\n\nTo use the bot again, you'll need to reconnect your GitHub account.",
@@ -1741,8 +1774,14 @@ def handle_app_mention(event, client, say, logger):
                 )
             return
         
-        # Early command classification to check if repo is needed
-        command = classify_command(message_text)
+        # Early command classification to check if repo is needed. Replies in an
+        # active PR thread also need the SUBMIT/REFINE intent, so get both in one call
+        intent = None
+        if thread_ts in pr_conversations:
+            classification = classify_everything(message_text)
+            intent, command = classification["intent"], classification["command"]
+        else:
+            command = classify_command(message_text)
         
         # Handle commands that DON'T require a repo to be set
         if command["command"] == "CREATE_REPO":
@@ -1797,6 +1836,7 @@ def handle_app_mention(event, client, say, logger):
                 is_initial=False,
                 image_data=image_data,
                 channel_name=stored_channel_name,
+                intent=intent,
             )
             return
         
@@ -2237,95 +2277,7 @@ def handle_message_events(event, say, client, logger):
 @flask_app.route('/auth/github/callback')
 def github_callback():
     """Handle GitHub OAuth callback"""
-    code = request.args.get('code')
-    state = request.args.get('state')
-    
-    if not code or not state:
-        return """
-        <html>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>❌ Authentication Failed</h1>
-                <p>Missing code or state parameter</p>
-            </body>
-        </html>
-        """, 400
-    
-    # Handle the OAuth callback (synchronous call)
-    result = asyncio.run(auth_manager.handle_oauth_callback(code, state))
-    
-    if result["success"]:
-        github_username = result["github_username"]
-        return f"""
-        <html>
-            <head>
-                <style>
-                    body {{
-                        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        padding: 40px;
-                        text-align: center;
-                        color: white;
-                    }}
-                    .container {{
-                        background: white;
-                        color: #333;
-                        padding: 40px;
-                        border-radius: 12px;
-                        max-width: 500px;
-                        margin: 0 auto;
-                        box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-                    }}
-                    h1 {{ color: #4CAF50; margin-bottom: 10px; }}
-                    .username {{ 
-                        background: #f0f0f0;
-                        padding: 10px 20px;
-                        border-radius: 20px;
-                        display: inline-block;
-                        margin: 20px 0;
-                        font-weight: bold;
-                    }}
-                    .next-steps {{
-                        text-align: left;
-                        background: #f9f9f9;
-                        padding: 20px;
-                        border-radius: 8px;
-                        margin-top: 20px;
-                    }}
-                    .next-steps li {{ margin: 10px 0; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <h1>✅ Successfully Connected!</h1>
-                    <p>Your GitHub account has been linked to the Slack bot.</p>
-                    <div class="username">🐙 {github_username}</div>
-                    
-                    <div class="next-steps">
-                        <h3>📋 Next Steps:</h3>
-                        <ol>
-                            <li>Go back to Slack</li>
-                            <li>Mention the bot: <code>@bot set repo owner/repository</code></li>
-                            <li>Start creating PRs: <code>@bot create a login page</code></li>
-                        </ol>
-                    </div>
-                    
-                    <p style="margin-top: 30px; color: #888; font-size: 14px;">
-                        You can close this window now
-                    </p>
-                </div>
-            </body>
-        </html>
-        """
-    else:
-        error = result.get("error", "Unknown error")
-        return f"""
-        <html>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>❌ Authentication Failed</h1>
-                <p>{error}</p>
-            </body>
-        </html>
-        """, 400
+    return oauth_callback_response(request.args.get('code'), request.args.get('state'))
 
 
 @flask_app.route('/health')